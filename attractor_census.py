@@ -0,0 +1,112 @@
+import numpy as np
+
+import batched_illusions
+import colour_options
+from batched_illusions import TIE
+
+# Number of colourings whose successors are determined at once.
+BLOCK_SIZE = 2 ** 14
+
+
+# The successor of every two-colouring of a graph under the majority threshold update of dynamic_illusions.py (all
+# nodes at once take the colour of the majority of their neighbours and keep their colour on a tie), and whether the
+# colouring has a (strict) majority-majority illusion. The colourings are indexed by their rank (see colour_options) and
+# handled in blocks: the red neighbour counts of a block are one matrix product, which gives both the local winners
+# for the illusion check and the next colourings. Returns a uint32 array with the rank of the successor of every
+# colouring and a boolean array with the illusions, which take 5 bytes per colouring, so 2^24 colourings take 80 MB.
+def colouring_transitions(graph, label_offset=0, block_size=BLOCK_SIZE):
+    num_nodes = len(graph.nodes)
+    adjacency = batched_illusions.adjacency_matrix(graph, label_offset)
+    # The colour of the node at position p is bit n - 1 - p of the rank.
+    place_values = (1 << np.arange(num_nodes - 1, -1, -1)).astype(np.uint32)
+    successors = np.empty(2 ** num_nodes, dtype=np.uint32)
+    illusions = np.empty(2 ** num_nodes, dtype=bool)
+    for start, colourings in colour_options.iterate_colour_option_blocks(graph, 2, block_size):
+        stop = start + len(colourings)
+        local_winners, illusions[start:stop] = batched_illusions.local_winners_and_illusions(adjacency, colourings)
+        new_colourings = np.where(local_winners == TIE, colourings, local_winners).astype(np.uint32)
+        successors[start:stop] = new_colourings @ place_values
+    return successors, illusions
+
+
+# Determine the attractor (the fixed point or cycle) that every colouring ends in, given the successor of every
+# colouring. The colourings without a predecessor are peeled off layer by layer, following the successors, which leaves
+# exactly the colourings on the attractors. The attractors are numbered in order of their smallest rank, and then the
+# layers are labelled in reverse order from the already labelled successors, so every colouring is resolved once
+# instead of running the dynamics from every start. Returns an int32 array with the number of the attractor of every
+# colouring, and the smallest rank and the period of every attractor.
+def resolve_attractors(successors):
+    num_colourings = len(successors)
+    predecessor_counts = np.bincount(successors, minlength=num_colourings).astype(np.uint32)
+    layers = []
+    layer = np.flatnonzero(predecessor_counts == 0).astype(np.uint32)
+    while len(layer) > 0:
+        layers.append(layer)
+        next_colourings, counts = np.unique(successors[layer], return_counts=True)
+        predecessor_counts[next_colourings] -= counts.astype(np.uint32)
+        layer = next_colourings[predecessor_counts[next_colourings] == 0]
+    attractor_colourings = np.flatnonzero(predecessor_counts)
+    del predecessor_counts
+    attractor_of = np.full(num_colourings, -1, dtype=np.int32)
+    # Fixed points are most of the attractors, so they are numbered at once. Only the longer cycles are walked.
+    fixed_points = attractor_colourings[successors[attractor_colourings] == attractor_colourings]
+    attractor_of[fixed_points] = np.arange(len(fixed_points), dtype=np.int32)
+    attractor_ranks = fixed_points.tolist()
+    periods = [1] * len(fixed_points)
+    for colouring in attractor_colourings.tolist():
+        if attractor_of[colouring] >= 0:
+            continue
+        cycle = [colouring]
+        next_colouring = int(successors[colouring])
+        while next_colouring != colouring:
+            cycle.append(next_colouring)
+            next_colouring = int(successors[next_colouring])
+        attractor_of[cycle] = len(attractor_ranks)
+        attractor_ranks.append(colouring)
+        periods.append(len(cycle))
+    for layer in reversed(layers):
+        attractor_of[layer] = attractor_of[successors[layer]]
+    # Number the attractors in order of their smallest rank.
+    order = np.argsort(attractor_ranks)
+    renumbering = np.empty(len(order), dtype=np.int32)
+    renumbering[order] = np.arange(len(order), dtype=np.int32)
+    attractor_of = renumbering[attractor_of]
+    return attractor_of, np.array(attractor_ranks, dtype=np.uint32)[order], np.array(periods, dtype=np.int64)[order]
+
+
+# Map every two-colouring of a graph to the attractor of the majority threshold update that it ends in, for graphs with
+# up to about 24 nodes, such as the 14-node graphs of create_regular_maj_maj_ill_graph. An attractor keeps the
+# illusion if every colouring on it has a majority-majority illusion, so the illusion is never lost.
+# Returns a dictionary with the smallest rank (see colour_options.colour_option), the period, the basin size and the
+# number of colourings with a majority-majority illusion in the basin of every attractor, which attractors keep the
+# illusion, the number of colourings with an illusion and how many of those end in an attractor that keeps it.
+def attractor_census(graph, label_offset=0, block_size=BLOCK_SIZE):
+    successors, illusions = colouring_transitions(graph, label_offset, block_size)
+    attractor_of, attractor_ranks, periods = resolve_attractors(successors)
+    basin_sizes = np.bincount(attractor_of, minlength=len(attractor_ranks))
+    illusion_basin_sizes = np.bincount(attractor_of[illusions], minlength=len(attractor_ranks))
+    # Walking every attractor for as many steps as the longest period visits all of its colourings.
+    colourings = attractor_ranks.copy()
+    attractor_illusions = illusions[colourings]
+    for _ in range(int(periods.max()) - 1):
+        colourings = successors[colourings]
+        attractor_illusions &= illusions[colourings]
+    return {"attractor_ranks": attractor_ranks, "periods": periods, "basin_sizes": basin_sizes,
+            "illusion_basin_sizes": illusion_basin_sizes, "attractor_illusions": attractor_illusions,
+            "illusion_colourings": int(illusion_basin_sizes.sum()),
+            "persistent_illusion_colourings": int(illusion_basin_sizes[attractor_illusions].sum())}
+
+
+# Print the number of attractors of each period, the attractors with the largest basins and how many colourings with a
+# majority-majority illusion end in an attractor that keeps it.
+def print_attractor_census(census, graph, max_printed=10):
+    periods, counts = np.unique(census["periods"], return_counts=True)
+    for period, count in zip(periods.tolist(), counts.tolist()):
+        print(count, "attractors with period", period)
+    for attractor in np.argsort(-census["basin_sizes"], kind="stable")[:max_printed].tolist():
+        colouring = colour_options.colour_option(int(census["attractor_ranks"][attractor]), graph, ["blue", "red"])
+        print("attractor", attractor, "period", census["periods"][attractor], "basin", census["basin_sizes"][attractor],
+              "with illusion", census["illusion_basin_sizes"][attractor], "keeps illusion",
+              bool(census["attractor_illusions"][attractor]), colouring)
+    print(census["persistent_illusion_colourings"], "of", census["illusion_colourings"],
+          "colourings with a majority-majority illusion end in an attractor that keeps it")
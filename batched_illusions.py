@@ -0,0 +1,109 @@
+import numpy as np
+
+import colour_options
+import illusion_profile
+from colour_codes import BLUE, RED, TIE, majority_winners
+
+
+# Create the adjacency matrix of a graph. Row i contains the neighbours of the node with label i + label_offset, so
+# label_offset should be 1 for graphs whose node labels start at 1.
+def adjacency_matrix(graph, label_offset=0):
+    num_nodes = len(graph.nodes)
+    adjacency = np.zeros((num_nodes, num_nodes), dtype=np.float64)
+    for node in graph.nodes():
+        for neighbour in graph.neighbors(node):
+            adjacency[node - label_offset, neighbour - label_offset] = 1
+    return adjacency
+
+
+# Check for a block of colourings (one colouring per row, 1 for red and 0 for blue) which nodes are under majority
+# illusion. The neighbour colour counts of all nodes and all colourings are computed with one matrix product.
+# Boolean weak is used in the same way as in check_majority_illusion_node.
+def majority_illusion_nodes(adjacency, colourings, weak):
+    colourings = colourings.astype(adjacency.dtype)
+    degrees = adjacency.sum(axis=1)
+    red_neighbour_counts = colourings @ adjacency.T
+    majority_colour_neighbours = majority_winners(red_neighbour_counts, degrees)
+    majority_colouring_global = majority_winners(colourings.sum(axis=1, keepdims=True), colourings.shape[1])
+    illusion = majority_colour_neighbours != majority_colouring_global
+    # If you require a strict majority illusion, then there is no illusion if either globally or locally there is a tie
+    if not weak:
+        illusion &= (majority_colour_neighbours != TIE) & (majority_colouring_global != TIE)
+    return illusion
+
+
+# Determine from the number of nodes under illusion per colouring whether there is a majority-majority illusion.
+# If weak_global is True, exactly half of the nodes being under illusion also counts.
+def majority_majority_illusions(illusion_counts, num_nodes, weak_global):
+    majority_majority_illusion = 2 * illusion_counts > num_nodes
+    if weak_global:
+        majority_majority_illusion |= 2 * illusion_counts == num_nodes
+    return majority_majority_illusion
+
+
+# The local majority winners of every node and whether there is a (strict) majority-majority illusion, for a block of
+# colourings (one colouring per row). Both come from one matrix product, so the local winners can also be used to
+# update the colourings with the majority threshold update.
+def local_winners_and_illusions(adjacency, colourings):
+    num_nodes = colourings.shape[1]
+    local_winners = majority_winners(colourings @ adjacency.T, adjacency.sum(axis=1))
+    global_winners = majority_winners(colourings.sum(axis=1, keepdims=True), num_nodes)
+    illusion = (local_winners != global_winners) & (local_winners != TIE) & (global_winners != TIE)
+    return local_winners, majority_majority_illusions(illusion.sum(axis=1), num_nodes, False)
+
+
+# Iterate over all two-colourings of a graph in blocks and yield the rank of the first colouring in the block
+# together with the number of nodes under majority illusion for every colouring in the block.
+def iterate_majority_illusion_counts(graph, weak_node, label_offset=0, block_size=2 ** 14):
+    adjacency = adjacency_matrix(graph, label_offset)
+    for start, colourings in colour_options.iterate_colour_option_blocks(graph, 2, block_size):
+        yield start, majority_illusion_nodes(adjacency, colourings, weak_node).sum(axis=1)
+
+
+# Iterate over the two-colourings of a graph that lead to a (weak-)majority-(weak)-majority illusion.
+# Yields the rank of each such colouring together with the number of nodes under majority illusion.
+def iterate_majority_majority_illusions(graph, weak_node, weak_global, label_offset=0, block_size=2 ** 14):
+    num_nodes = len(graph.nodes)
+    for start, illusion_counts in iterate_majority_illusion_counts(graph, weak_node, label_offset, block_size):
+        for index in np.flatnonzero(majority_majority_illusions(illusion_counts, num_nodes, weak_global)):
+            yield start + int(index), int(illusion_counts[index])
+
+
+# Turn a block of integer-coded colourings (one colouring per row) into one-hot form: entry (b, i, c) is 1 if node i
+# has colour c in colouring b.
+def one_hot_colourings(colourings, num_colours, dtype=np.float64):
+    return (colourings[:, :, np.newaxis] == np.arange(num_colours)).astype(dtype)
+
+
+# Check for a block of integer-coded colourings with num_colours colours which nodes are under strict and under weak
+# plurality illusion. The neighbour colour counts of all nodes and all colourings form a (batch, n, num_colours) tensor
+# that is computed with one product of the adjacency matrix and the one-hot colourings. Which nodes are under illusion
+# follows from these counts as in illusion_profile.illusion_nodes. Returns two (batch, n) boolean arrays.
+def plurality_illusion_nodes(adjacency, colourings, num_colours):
+    one_hot = one_hot_colourings(colourings, num_colours, adjacency.dtype)
+    neighbour_colour_counts = np.matmul(adjacency, one_hot)
+    return illusion_profile.illusion_nodes(neighbour_colour_counts, one_hot.sum(axis=1), "plurality")
+
+
+# Iterate over all colourings of a graph with num_colours colours in blocks, starting from the colouring with rank
+# first_rank, and yield the rank of the first colouring in the block together with the number of nodes under strict and
+# under weak plurality illusion for every colouring.
+def iterate_plurality_illusion_counts(graph, num_colours, label_offset=0, block_size=2 ** 12, first_rank=0):
+    adjacency = adjacency_matrix(graph, label_offset)
+    for start, colourings in colour_options.iterate_colour_option_blocks(graph, num_colours, block_size, first_rank):
+        strict_illusion, weak_illusion = plurality_illusion_nodes(adjacency, colourings, num_colours)
+        yield start, strict_illusion.sum(axis=1), weak_illusion.sum(axis=1)
+
+
+# Iterate over the colourings of a graph with num_colours colours that lead to some (weak)-1/k-(weak)-plurality
+# illusion, in order of rank. Yields the rank of each such colouring together with whether there is a 1/k-plurality,
+# 1/k-weak-plurality, weak-1/k-plurality and weak-1/k-weak-plurality illusion, as returned by plurality_illusion_graph.
+def iterate_plurality_illusions(graph, num_colours, k, label_offset=0, block_size=2 ** 12):
+    num_nodes = len(graph.nodes)
+    for start, strict_counts, weak_counts in iterate_plurality_illusion_counts(graph, num_colours, label_offset,
+                                                                             block_size):
+        strict_illusions = illusion_profile.k_fraction_illusions(strict_counts, num_nodes, k)
+        weak_illusions = illusion_profile.k_fraction_illusions(weak_counts, num_nodes, k)
+        illusions = np.stack([strict_illusions[0], weak_illusions[0], strict_illusions[1], weak_illusions[1]], axis=1)
+        for index in np.flatnonzero(illusions.any(axis=1)):
+            yield start + int(index), tuple(bool(illusion) for illusion in illusions[index])
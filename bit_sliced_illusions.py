@@ -0,0 +1,119 @@
+import numpy as np
+
+# Number of colourings that are packed into one machine word.
+WORD_BITS = 64
+# The bit pattern of the node whose colour changes with every colouring, every second colouring, every fourth
+# colouring etc. within a word: bit j of pattern b is bit b of j.
+LOW_BIT_PATTERNS = [np.uint64(sum(1 << j for j in range(WORD_BITS) if (j >> bit) & 1)) for bit in range(6)]
+ALL_ONES = np.uint64(2 ** 64 - 1)
+
+
+# The bit-planes of the two-colourings with ranks from WORD_BITS * first_word onwards, for num_words words. Row p
+# holds the colour of the node at position p: bit j of word w is 1 if the node is red in colouring
+# WORD_BITS * (first_word + w) + j. The node at position p is bit num_nodes - 1 - p of the rank.
+def colour_planes(num_nodes, first_word, num_words):
+    words = np.arange(first_word, first_word + num_words, dtype=np.uint64)
+    planes = np.empty((num_nodes, num_words), dtype=np.uint64)
+    for position in range(num_nodes):
+        bit = num_nodes - 1 - position
+        if bit < 6:
+            planes[position] = LOW_BIT_PATTERNS[bit]
+        else:
+            planes[position] = np.where((words >> np.uint64(bit - 6)) & np.uint64(1), ALL_ONES, np.uint64(0))
+    return planes
+
+
+# Count for every bit how many of the given bit-planes have that bit set. Returns a bit-sliced counter, which is a list
+# of bit-planes with the least significant digit first. Every plane is added with a ripple-carry adder that works on all
+# bits of the words at once, and the counter only gets a new digit when the number of added planes needs it.
+def count_planes(planes, num_words):
+    counter = [np.zeros(num_words, dtype=np.uint64)]
+    for added, plane in enumerate(planes, 1):
+        if added.bit_length() > len(counter):
+            counter.append(np.zeros(num_words, dtype=np.uint64))
+        carry = plane
+        for digit in range(len(counter)):
+            counter[digit], carry = counter[digit] ^ carry, counter[digit] & carry
+    return counter
+
+
+# Compare a bit-sliced counter with a constant. Returns a bit-plane in which a bit is set if the count of that bit is
+# at least the constant. The digits are compared from the most significant one down.
+def at_least(counter, constant):
+    if constant <= 0:
+        return np.full(counter[0].shape, ALL_ONES)
+    if constant >> len(counter):
+        return np.zeros(counter[0].shape, dtype=np.uint64)
+    greater = np.zeros(counter[0].shape, dtype=np.uint64)
+    equal = np.full(counter[0].shape, ALL_ONES)
+    for digit in range(len(counter) - 1, -1, -1):
+        if (constant >> digit) & 1:
+            equal = equal & counter[digit]
+        else:
+            greater = greater | (equal & counter[digit])
+            equal = equal & ~counter[digit]
+    return greater | equal
+
+
+# The bit-planes of the majority winners for red counts out of total: whether red wins and whether blue wins. If
+# neither wins, there is a tie.
+def majority_winner_planes(red_counter, total):
+    red_wins = at_least(red_counter, total // 2 + 1)
+    blue_wins = ~at_least(red_counter, (total + 1) // 2)
+    return red_wins, blue_wins
+
+
+# Check blocks of 64 two-colourings per word which nodes are under majority illusion and count them per colouring,
+# using only bitwise operations. Boolean weak is used in the same way as in check_majority_illusion_node.
+# Returns the bit-sliced counter of the number of nodes under illusion.
+def illusion_counter(planes, neighbour_positions, weak):
+    num_nodes, num_words = planes.shape
+    global_red, global_blue = majority_winner_planes(count_planes(planes, num_words), num_nodes)
+    global_tie = ~(global_red | global_blue)
+    illusion_planes = []
+    for positions in neighbour_positions:
+        local_red, local_blue = majority_winner_planes(count_planes(planes[positions], num_words), len(positions))
+        if weak:
+            local_tie = ~(local_red | local_blue)
+            illusion = ~((local_red & global_red) | (local_blue & global_blue) | (local_tie & global_tie))
+        else:
+            illusion = (local_red & global_blue) | (local_blue & global_red)
+        illusion_planes.append(illusion)
+    return count_planes(illusion_planes, num_words)
+
+
+# The positions of the neighbours of every node. Multiple edges between two nodes count as one neighbour, as in
+# check_majority_illusion_node.
+def neighbour_positions_of(graph, label_offset=0):
+    neighbour_positions = [[] for _ in range(len(graph.nodes))]
+    for node in graph.nodes():
+        neighbour_positions[node - label_offset] = [neighbour - label_offset for neighbour in graph.neighbors(node)]
+    return neighbour_positions
+
+
+# Iterate over the two-colourings of a graph with at most 64 nodes that lead to a (weak-)majority-(weak)-majority
+# illusion. The colourings are packed 64 to a word in bit-planes, one row of words per node, so every bitwise operation
+# checks 64 colourings. Yields the rank of each such colouring in order, together with the number of nodes under
+# majority illusion.
+def iterate_majority_majority_illusions(graph, weak_node, weak_global, label_offset=0, block_words=2 ** 10):
+    num_nodes = len(graph.nodes)
+    if num_nodes > 64:
+        raise ValueError("The bit-sliced evaluator works for graphs with at most 64 nodes.")
+    neighbour_positions = neighbour_positions_of(graph, label_offset)
+    number_of_colourings = 2 ** num_nodes
+    number_of_words = -(-number_of_colourings // WORD_BITS)
+    needed = (num_nodes + 1) // 2 if weak_global else num_nodes // 2 + 1
+    for first_word in range(0, number_of_words, block_words):
+        num_words = min(block_words, number_of_words - first_word)
+        counter = illusion_counter(colour_planes(num_nodes, first_word, num_words), neighbour_positions, weak_node)
+        illusions = at_least(counter, needed)
+        # Unpack the words into one bit per colouring, in order of rank.
+        flags = np.unpackbits(illusions.view(np.uint8), bitorder="little").astype(bool)
+        flags = flags[:number_of_colourings - first_word * WORD_BITS]
+        indices = np.flatnonzero(flags)
+        if len(indices) == 0:
+            continue
+        digits = np.stack([np.unpackbits(digit.view(np.uint8), bitorder="little")[indices] for digit in counter])
+        illusion_counts = (1 << np.arange(len(counter), dtype=np.int64)) @ digits
+        for index, illusion_count in zip(indices.tolist(), illusion_counts.tolist()):
+            yield first_word * WORD_BITS + index, illusion_count
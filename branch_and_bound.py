@@ -0,0 +1,155 @@
+import networkx as nx
+
+import csr_graph
+from batched_illusions import BLUE, RED
+from gray_code_search import local_majority_winner
+
+
+# Check whether a node can still end up under majority illusion when between lowest and highest of its neighbours
+# will be red and the global winner is fixed. Boolean weak is used in the same way as in check_majority_illusion_node.
+def illusion_possible(lowest, highest, degree, global_winner, weak):
+    if global_winner == RED:
+        return 2 * lowest < degree or (weak and 2 * lowest == degree)
+    if global_winner == BLUE:
+        return 2 * highest > degree or (weak and 2 * highest == degree)
+    # If there is a global tie, only a weak illusion is possible and then the node must not see a tie.
+    return weak and (lowest < highest or 2 * lowest != degree)
+
+
+# Determine in which order the nodes are coloured. Nodes that are close to each other are coloured after each other,
+# so that the neighbourhoods of nodes are complete early in the search and branches can be pruned early.
+def assignment_order(graph, label_offset=0):
+    undirected_graph = nx.Graph(csr_graph.as_networkx(graph))
+    return [node - label_offset for node in nx.utils.cuthill_mckee_ordering(undirected_graph)]
+
+
+# Iterate over the two-colourings of a graph that lead to a (weak-)majority-(weak)-majority illusion using branch and
+# bound. For two colours the global winner only depends on the number of red nodes, so the colourings are searched
+# class by class with a fixed number of red nodes and a fixed global winner. The nodes are coloured one by one and a
+# partial colouring is pruned as soon as an upper bound shows that a majority of nodes under illusion can no longer be
+# reached.
+# Yields the rank of every such colouring (as used by colour_options.colour_option) together with the number of nodes
+# under illusion. The colourings are not yielded in order of rank.
+def iterate_majority_majority_illusions(graph, weak_node, weak_global, label_offset=0):
+    num_nodes = len(graph.nodes)
+    degrees = [0] * num_nodes
+    predecessors = [[] for _ in range(num_nodes)]
+    for node in graph.nodes():
+        for neighbour in graph.neighbors(node):
+            degrees[node - label_offset] = degrees[node - label_offset] + 1
+            predecessors[neighbour - label_offset].append(node - label_offset)
+    order = assignment_order(graph, label_offset)
+    supply = supply_per_depth(predecessors, order)
+    # The number of nodes under illusion that is needed for a (weak-)majority-(weak)-majority illusion.
+    if weak_global:
+        needed = (num_nodes + 1) // 2
+    else:
+        needed = num_nodes // 2 + 1
+    for num_red in range(num_nodes + 1):
+        global_winner = local_majority_winner(num_red, num_nodes)
+        yield from search_class(num_red, global_winner, degrees, predecessors, order, supply, needed,
+                                weak_node)
+
+
+# The smallest number of neighbours of a node that need to have the global minority colour for the node to be under
+# majority illusion. Only used if there is a global winner.
+def minority_neighbours_needed(degree, weak):
+    if weak:
+        return degree - degree // 2
+    return degree // 2 + 1
+
+
+# An upper bound on the number of nodes that can end up under illusion if there is a global winner. Every node that
+# still needs extra neighbours with the minority colour takes them from the uncoloured nodes that will get the minority
+# colour, and each of those is a neighbour of at most its number of predecessors. The nodes needing the fewest extra
+# minority neighbours are counted first, as long as the minority nodes that are left can provide them.
+def minority_supply_bound(extra_needed, supply):
+    bound = 0
+    for extra in sorted(extra_needed):
+        if extra > supply:
+            break
+        supply = supply - extra
+        bound = bound + 1
+    return bound
+
+
+# For every depth in the search, determine the largest total number of predecessors of m of the uncoloured nodes for
+# every m. This limits how often the nodes that are still uncoloured can be a neighbour with a certain colour.
+def supply_per_depth(predecessors, order):
+    supply_per_depth = []
+    for depth in range(len(order) + 1):
+        in_degrees = sorted((len(predecessors[node]) for node in order[depth:]), reverse=True)
+        supply = [0]
+        for in_degree in in_degrees:
+            supply.append(supply[-1] + in_degree)
+        supply_per_depth.append(supply)
+    return supply_per_depth
+
+
+# Search all colourings with num_red red nodes for colourings with at least the needed number of nodes under illusion.
+def search_class(num_red, global_winner, degrees, predecessors, order, supply, needed, weak_node):
+    num_nodes = len(degrees)
+    minority_needed = [minority_neighbours_needed(degree, weak_node) for degree in degrees]
+    colouring = [BLUE] * num_nodes
+    red_neighbours = [0] * num_nodes
+    uncoloured_neighbours = list(degrees)
+    possible = [illusion_possible(0, degree, degree, global_winner, weak_node) for degree in degrees]
+    possible_count = [sum(possible)]
+
+    # Check whether enough nodes can still end up under illusion, given the colours that are left to hand out.
+    def enough_illusions_possible(depth, reds_left):
+        if possible_count[0] < needed:
+            return False
+        if global_winner == RED:
+            minority_left = (num_nodes - depth) - reds_left
+        elif global_winner == BLUE:
+            minority_left = reds_left
+        else:
+            return True
+        extra_needed = []
+        for node in range(num_nodes):
+            if possible[node]:
+                if global_winner == RED:
+                    minority_coloured = degrees[node] - uncoloured_neighbours[node] - red_neighbours[node]
+                else:
+                    minority_coloured = red_neighbours[node]
+                extra_needed.append(max(0, minority_needed[node] - minority_coloured))
+        return minority_supply_bound(extra_needed, supply[depth][minority_left]) >= needed
+
+    def colour_next(depth, reds_left):
+        if depth == num_nodes:
+            rank = 0
+            for colour in colouring:
+                rank = 2 * rank + colour
+            yield rank, possible_count[0]
+            return
+        node = order[depth]
+        for colour in (BLUE, RED):
+            # Make sure that exactly num_red nodes can be coloured red.
+            if (colour == RED and reds_left == 0) or (colour == BLUE and reds_left == num_nodes - depth):
+                continue
+            colouring[node] = colour
+            no_longer_possible = []
+            for predecessor in predecessors[node]:
+                uncoloured_neighbours[predecessor] = uncoloured_neighbours[predecessor] - 1
+                red_neighbours[predecessor] = red_neighbours[predecessor] + colour
+                if possible[predecessor] and not illusion_possible(
+                        red_neighbours[predecessor], red_neighbours[predecessor] + uncoloured_neighbours[predecessor],
+                        degrees[predecessor], global_winner, weak_node):
+                    possible[predecessor] = False
+                    no_longer_possible.append(predecessor)
+            possible_count[0] = possible_count[0] - len(no_longer_possible)
+            # Only continue if enough nodes can still end up under illusion.
+            if enough_illusions_possible(depth + 1, reds_left - colour):
+                yield from colour_next(depth + 1, reds_left - colour)
+            # Undo the colouring of this node.
+            possible_count[0] = possible_count[0] + len(no_longer_possible)
+            for predecessor in no_longer_possible:
+                possible[predecessor] = True
+            for predecessor in predecessors[node]:
+                uncoloured_neighbours[predecessor] = uncoloured_neighbours[predecessor] + 1
+                red_neighbours[predecessor] = red_neighbours[predecessor] - colour
+        colouring[node] = BLUE
+
+    if enough_illusions_possible(0, num_red):
+        yield from colour_next(0, num_red)
@@ -0,0 +1,117 @@
+import numpy as np
+
+import csr_graph
+
+
+# Integer-coded colourings. A colouring with q colours is a uint8 array with one entry per node that holds the index of
+# the colour of the node in the list of colours. Sets of colours, such as the plurality or quota winners, are bitmasks in
+# which bit c is set if colour c is in the set. A two-colouring can also be packed into a single integer in which the
+# colour of the node at position p is bit n - 1 - p, which is the rank of the colouring in colour_options.
+
+# Integer codes of the colours and of a tie. Colour codes are the indices in the list ["blue", "red"].
+BLUE = 0
+RED = 1
+TIE = 2
+
+
+# Determine the majority winner (BLUE, RED or TIE) from the number of red agents and the total number of agents.
+# Works element-wise on arrays, so the winners of many nodes and colourings are determined at once.
+def majority_winners(red_counts, totals):
+    winners = np.full(np.broadcast(red_counts, totals).shape, TIE, dtype=np.int8)
+    winners[2 * red_counts > totals] = RED
+    winners[2 * red_counts < totals] = BLUE
+    return winners
+
+
+# Turn a colouring given by colour names into an integer-coded colouring. Integer-coded colourings are returned as
+# they are.
+def encode_colouring(colouring, colours):
+    if isinstance(colouring, np.ndarray):
+        return colouring
+    codes = {colour: code for code, colour in enumerate(colours)}
+    return np.array([codes[colour] for colour in colouring], dtype=np.uint8)
+
+
+# Turn an integer-coded colouring into a list of colour names, for example to plot it. Colourings given by colour
+# names are returned as they are.
+def decode_colouring(colouring, colours):
+    if not isinstance(colouring, np.ndarray):
+        return colouring
+    return [colours[code] for code in colouring]
+
+
+# Pack an integer-coded two-colouring into an integer with one bit per node.
+def pack_two_colouring(colouring):
+    packed = 0
+    for code in colouring.tolist():
+        packed = 2 * packed + code
+    return packed
+
+
+# Unpack an integer with one bit per node into an integer-coded two-colouring of num_nodes nodes.
+def unpack_two_colouring(packed, num_nodes):
+    bits = np.arange(num_nodes - 1, -1, -1, dtype=np.uint64)
+    return ((np.uint64(packed) >> bits) & np.uint64(1)).astype(np.uint8)
+
+
+# The colours of the neighbours of a node in an integer-coded colouring. The neighbours can be given by a networkx
+# graph or by a csr_graph.CSRGraph, whose neighbours are already an array.
+def neighbour_colours(graph, node, colouring, label_offset=0):
+    neighbours = graph.neighbors(node)
+    if not isinstance(neighbours, np.ndarray):
+        neighbours = np.fromiter(neighbours, dtype=np.intp)
+    return colouring[neighbours - label_offset]
+
+
+# The number of nodes with each colour.
+def colour_counts(colouring, num_colours):
+    return np.bincount(colouring, minlength=num_colours)
+
+
+# The number of neighbours with each colour for every node, as an array with one row per node position (label minus
+# label_offset). All neighbours of all nodes are counted at once.
+def neighbour_colour_counts(graph, colouring, num_colours, label_offset=0):
+    num_nodes = len(graph.nodes)
+    if isinstance(graph, csr_graph.CSRGraph):
+        degrees = np.diff(graph.offsets)
+        targets = graph.targets
+    else:
+        degrees = np.zeros(num_nodes, dtype=np.int64)
+        targets = []
+        for node in sorted(graph.nodes()):
+            neighbours = list(graph.neighbors(node))
+            degrees[node - label_offset] = len(neighbours)
+            targets.extend(neighbours)
+        targets = np.array(targets, dtype=np.int64)
+    sources = np.repeat(np.arange(num_nodes), degrees)
+    pairs = sources * num_colours + colouring[targets - label_offset]
+    return np.bincount(pairs, minlength=num_nodes * num_colours).reshape(num_nodes, num_colours)
+
+
+# The number of neighbours with each colour for every node in a batch of integer-coded colourings (one colouring per
+# row) of a csr_graph.CSRGraph, as an array of shape (colourings, nodes, colours). Only the edges are visited, so this
+# works for sparse graphs with millions of nodes; the batch should be small enough for colourings times edges entries.
+def batch_neighbour_colour_counts(graph, colourings, num_colours):
+    num_colourings, num_nodes = colourings.shape
+    sources = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(graph.offsets)) * num_colours
+    rows = np.arange(num_colourings, dtype=np.int64)[:, np.newaxis] * (num_nodes * num_colours)
+    pairs = rows + sources + colourings[:, graph.targets - graph.label_offset]
+    counts = np.bincount(pairs.ravel(), minlength=num_colourings * num_nodes * num_colours)
+    return counts.reshape(num_colourings, num_nodes, num_colours)
+
+
+# The plurality winners as bitmasks: the colours that appear most often. Works on one array of colour counts or on one
+# row of counts per node. Nothing wins if there are no nodes.
+def plurality_winner_masks(counts):
+    highest = counts.max(axis=-1, keepdims=True)
+    winners = (counts == highest) & (highest > 0)
+    return winners.astype(np.int64) @ (1 << np.arange(counts.shape[-1], dtype=np.int64))
+
+
+# The quota winners as bitmasks: the colours that make up more than a quota-fraction of the nodes. Works on one array
+# of colour counts or on one row of counts per node.
+def quota_winner_masks(counts, quota):
+    totals = counts.sum(axis=-1, keepdims=True)
+    fractions = counts / np.maximum(totals, 1)
+    winners = (counts > 0) & (fractions > quota)
+    return winners.astype(np.int64) @ (1 << np.arange(counts.shape[-1], dtype=np.int64))
@@ -0,0 +1,76 @@
+import itertools
+import numpy as np
+
+
+# Iterate over all possible ways to colour a graph with the given colours, one colouring at a time.
+# The colourings appear in the same order as the lists that were built before: the colour of the first node changes
+# slowest and the colour of the last node changes fastest. Only one colouring is held in memory at a time.
+def iterate_colour_options(graph, colours):
+    for colouring in itertools.product(colours, repeat=len(graph.nodes)):
+        yield list(colouring)
+
+
+# Iterate over all possible colourings of a graph in lists of at most chunk_size colourings.
+def iterate_colour_option_chunks(graph, colours, chunk_size):
+    colourings = iterate_colour_options(graph, colours)
+    chunk = list(itertools.islice(colourings, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(colourings, chunk_size))
+
+
+# The number of possible colourings of a graph with the given colours.
+def number_of_colour_options(graph, colours):
+    return len(colours) ** len(graph.nodes)
+
+
+# The colouring at position rank in the order of iterate_colour_options.
+def colour_option(rank, graph, colours):
+    colouring = []
+    for _ in range(len(graph.nodes)):
+        rank, colour_index = divmod(rank, len(colours))
+        colouring.append(colours[colour_index])
+    colouring.reverse()
+    return colouring
+
+
+# The colourings at positions start up to stop in the order of iterate_colour_options as a 2-D array with one row per
+# colouring and one column per node. Each colour is coded by its index in the list of colours.
+def colour_option_block(num_nodes, num_colours, start, stop):
+    ranks = np.arange(start, stop, dtype=np.int64)
+    place_values = num_colours ** np.arange(num_nodes - 1, -1, -1, dtype=np.int64)
+    return (ranks[:, np.newaxis] // place_values % num_colours).astype(np.uint8)
+
+
+# Iterate over all integer-coded colourings of a graph in blocks of at most block_size colourings, starting from the
+# colouring with rank first_rank. Yields the rank of the first colouring in the block together with the block.
+def iterate_colour_option_blocks(graph, num_colours, block_size, first_rank=0):
+    num_nodes = len(graph.nodes)
+    number_of_colourings = num_colours ** num_nodes
+    for start in range(first_rank, number_of_colourings, block_size):
+        stop = min(start + block_size, number_of_colourings)
+        yield start, colour_option_block(num_nodes, num_colours, start, stop)
+
+
+# The position of a colouring in the order of iterate_colour_options.
+def colour_option_rank(colouring, colours):
+    rank = 0
+    for colour in colouring:
+        rank = rank * len(colours) + colours.index(colour)
+    return rank
+
+
+# Iterate over the colourings at positions start up to stop in the order of iterate_colour_options. Only the first
+# colouring is computed from its rank; the others follow by counting up in base len(colours), so no list of
+# colourings is needed to search a part of all colourings.
+def iterate_colour_options_between(graph, colours, start, stop):
+    codes = [colours.index(colour) for colour in colour_option(start, graph, colours)]
+    for _ in range(start, stop):
+        yield [colours[code] for code in codes]
+        position = len(codes) - 1
+        while position >= 0:
+            codes[position] = codes[position] + 1
+            if codes[position] < len(colours):
+                break
+            codes[position] = 0
+            position = position - 1
@@ -0,0 +1,104 @@
+import json
+import multiprocessing
+import os
+import time
+
+# How often (in seconds) the number of checked graphs per second is reported.
+REPORT_INTERVAL = 10
+
+
+# Read the outcomes that were recorded in a results file by an earlier run. Every line holds the outcome of one seed.
+# A line that was only partly written when the earlier run stopped is ignored, so that seed is checked again.
+def read_results(results_path):
+    results = {}
+    if not os.path.exists(results_path):
+        return results
+    with open(results_path) as results_file:
+        for line in results_file:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            results[result["seed"]] = result
+    return results
+
+
+# Make sure the results file ends with a complete line, so new outcomes are not appended to a line that was only partly
+# written when an earlier run stopped.
+def finish_last_line(results_path):
+    if not os.path.exists(results_path) or os.path.getsize(results_path) == 0:
+        return
+    with open(results_path, "rb+") as results_file:
+        results_file.seek(-1, os.SEEK_END)
+        if results_file.read(1) != b"\n":
+            results_file.write(b"\n")
+
+
+# The first seed from which the search continues: every seed before it has been checked already.
+def first_unchecked_seed(results, first_seed):
+    seed = first_seed
+    while seed in results:
+        seed = seed + 1
+    return seed
+
+
+# Check one seed in a worker process. Returns the seed, whether it gave a counter-example and how long it took.
+def check_seed(arguments):
+    seed_check, check_arguments, seed = arguments
+    start_time = time.time()
+    counter_example = bool(seed_check(seed, *check_arguments))
+    return seed, counter_example, time.time() - start_time
+
+
+# Search for a counter-example by checking the graphs created from consecutive seeds on a pool of worker processes.
+# seed_check(seed, *check_arguments) creates the graph for a seed and returns True if it is a counter-example. The
+# outcome of every seed is appended to a results file as soon as it is known, so after a crash or restart the search
+# resumes after the seeds that have already been checked. Seeds are handed out in ranges of seeds_per_task seeds. Once
+# a worker finds a counter-example, the lower seeds that are still being checked are waited for, and then all workers
+# are stopped, so the lowest seed that gives a counter-example is returned whichever worker finishes first. If
+# last_seed is None the search only stops when a counter-example is found. Returns the seed of the counter-example, or
+# None if there is none up to last_seed.
+def search_seeds(seed_check, check_arguments, results_path, processes=None, first_seed=1, last_seed=None,
+                 seeds_per_task=1):
+    if processes is None:
+        processes = os.cpu_count()
+    results = read_results(results_path)
+    for seed, result in sorted(results.items()):
+        if result["counter_example"] and seed >= first_seed and (last_seed is None or seed <= last_seed):
+            print("Seed", seed, "was already found to give a counter-example.")
+            return seed
+    finish_last_line(results_path)
+    # The seeds are handed out in batches, so the seeds that are waiting to be checked stay limited.
+    batch_size = 4 * processes * seeds_per_task
+    checked = 0
+    start_time = time.time()
+    last_report = start_time
+    with multiprocessing.Pool(processes) as pool, open(results_path, "a") as results_file:
+        batch_start = first_unchecked_seed(results, first_seed)
+        while last_seed is None or batch_start <= last_seed:
+            batch_stop = batch_start + batch_size
+            if last_seed is not None:
+                batch_stop = min(batch_stop, last_seed + 1)
+            tasks = ((seed_check, check_arguments, seed) for seed in range(batch_start, batch_stop)
+                     if seed not in results)
+            counter_example_seed = None
+            for seed, counter_example, seconds in pool.imap_unordered(check_seed, tasks, seeds_per_task):
+                result = {"seed": seed, "counter_example": counter_example, "seconds": round(seconds, 6)}
+                results_file.write(json.dumps(result) + "\n")
+                results_file.flush()
+                results[seed] = result
+                checked = checked + 1
+                if counter_example and (counter_example_seed is None or seed < counter_example_seed):
+                    counter_example_seed = seed
+                # All earlier batches have been checked completely, so only the seeds of this batch can be lower.
+                if counter_example_seed is not None and all(
+                        earlier_seed in results for earlier_seed in range(batch_start, counter_example_seed)):
+                    # Leaving the pool terminates the workers that are still checking higher seeds.
+                    print("Seed", counter_example_seed, "gives a counter-example.")
+                    return counter_example_seed
+                if time.time() - last_report >= REPORT_INTERVAL:
+                    last_report = time.time()
+                    print(checked, "graphs checked,", round(checked / (last_report - start_time), 2), "graphs/s")
+            batch_start = batch_stop
+    print(checked, "graphs checked,", round(checked / max(time.time() - start_time, 1e-9), 2), "graphs/s")
+    return None
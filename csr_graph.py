@@ -0,0 +1,93 @@
+import networkx as nx
+import numpy as np
+
+
+# The nodes of a CSRGraph. Like the nodes of a networkx graph they can be used both as graph.nodes and as
+# graph.nodes(), so code written for networkx graphs also works for a CSRGraph.
+class CSRNodes:
+    def __init__(self, label_offset, num_nodes):
+        self.labels = range(label_offset, label_offset + num_nodes)
+
+    def __call__(self):
+        return self
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __iter__(self):
+        return iter(self.labels)
+
+    def __contains__(self, node):
+        return node in self.labels
+
+    def __repr__(self):
+        return str(list(self.labels))
+
+
+# A read-only graph stored in compressed sparse row form. The neighbours of the node at position p (its label minus
+# label_offset) are targets[offsets[p]:offsets[p + 1]], stored as node labels, so a CSRGraph can be used instead of the
+# networkx graph it was built from by every function that only calls nodes() and neighbors(). The labels of the nodes
+# must be label_offset, label_offset + 1, ..., which is 0 in most modules and 1 in dynamic_illusions.py. If no
+# label_offset is given, the smallest label of the graph is used.
+class CSRGraph:
+    def __init__(self, graph, label_offset=None):
+        labels = sorted(graph.nodes())
+        if label_offset is None:
+            label_offset = labels[0] if labels else 0
+        if labels != list(range(label_offset, label_offset + len(labels))):
+            raise ValueError("The nodes of the graph must be labelled " + str(label_offset) + " up to "
+                             + str(label_offset + len(labels) - 1) + ".")
+        self.label_offset = label_offset
+        self.directed = graph.is_directed()
+        self.nodes = CSRNodes(label_offset, len(labels))
+        degrees = np.zeros(len(labels), dtype=np.int32)
+        for node in labels:
+            degrees[node - label_offset] = len(graph[node])
+        self.offsets = np.zeros(len(labels) + 1, dtype=np.int32)
+        np.cumsum(degrees, out=self.offsets[1:])
+        self.targets = np.empty(self.offsets[-1], dtype=np.int32)
+        for node in labels:
+            position = node - label_offset
+            self.targets[self.offsets[position]:self.offsets[position + 1]] = list(graph.neighbors(node))
+        self.offsets.setflags(write=False)
+        self.targets.setflags(write=False)
+
+    # The neighbours of a node as a read-only view of the targets array.
+    def neighbors(self, node):
+        position = node - self.label_offset
+        return self.targets[self.offsets[position]:self.offsets[position + 1]]
+
+    def degree(self, node):
+        position = node - self.label_offset
+        return int(self.offsets[position + 1] - self.offsets[position])
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        if self.directed:
+            return len(self.targets)
+        return len(self.targets) // 2
+
+    def is_directed(self):
+        return self.directed
+
+    def edges(self):
+        for node in self.nodes:
+            for neighbour in self.neighbors(node):
+                if self.directed or node <= neighbour:
+                    yield node, int(neighbour)
+
+    # Create a networkx graph with the same nodes and edges.
+    def to_networkx(self):
+        graph = nx.DiGraph() if self.directed else nx.Graph()
+        graph.add_nodes_from(self.nodes)
+        graph.add_edges_from(self.edges())
+        return graph
+
+
+# Return a networkx graph for functions that need more than nodes() and neighbors(), such as isomorphism checks.
+def as_networkx(graph):
+    if isinstance(graph, CSRGraph):
+        return graph.to_networkx()
+    return graph
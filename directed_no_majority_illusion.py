@@ -1,60 +1,33 @@
 import networkx as nx
+import numpy as np
 import matplotlib.pyplot as plt
 from collections import Counter
-import random
+
+import batched_illusions
+import bit_sliced_illusions
+import branch_and_bound
+import colour_codes
+import colour_options
+import counter_example_search
+import csr_graph
+import gray_code_search
+import illusion_queries
+import random_digraphs
+import symmetry_reduction
+import tree_decomposition_count
+from batched_illusions import TIE
 
 
 # Create a random directed graph using a specified number of nodes.
-def create_random_directed_graph(nodes):
-    # graph = nx.scale_free_graph(nodes)
-    graph = nx.random_k_out_graph(nodes, 3, alpha=0.5, self_loops=False)
-    temp_graph = graph.copy()
-    for node in graph.nodes():
-        neighbours = list(graph.neighbors(node))
-        temp_graph = graph.copy()
-        # Make sure the digraph does not contain multiple edges between 2 nodes
-        for neighbour in neighbours:
-            counter = 0
-            for edge in temp_graph.edges():  # Loop over the edges
-                if edge == (node, neighbour):  # Count how many times the current (node,neighbour) edge appears
-                    counter = counter + 1
-            while counter > 1:  # While there is more than 1 of the same (node, neighbour) edge, remove the edge
-                temp_graph.remove_edges_from([(node, neighbour)])
-                counter = counter - 1
-        if node in neighbours:  # Remove self-loops
-            temp_graph.remove_edges_from([(node, node)])
-            neighbours.remove(node)
-        graph = temp_graph.copy()
-        if not neighbours:  # Ensure every node has a neighbour
-            temp_graph = graph.copy()
-            random_node = random.randint(0, len(graph.nodes()))
-            if random_node != node:
-                temp_graph.add_edge(node, random_node)
-    graph = temp_graph.copy()
-    # nx.draw(graph)
-    # plt.show()
-    return graph
+def create_random_directed_graph(nodes, seed_number=None):
+    # Every node gets 3 random neighbours among the other nodes, where a neighbour drawn twice becomes one edge, so the
+    # digraph has no self-loops or multiple edges and every node has a neighbour.
+    return random_digraphs.create_random_k_out_digraph(nodes, 3, seed_number)
 
 
-# Create all possible ways to colour a graph using two colours
+# Lazily iterate over all possible ways to colour a graph using two colours
 def all_colour_options_graph(graph):
-    colours = [[]]
-    # Loop over the nodes
-    for node in range(len(graph.nodes)):
-        temp_colours = []
-        # Loop over the colour lists so far
-        for item in colours:
-            # For each colour list add blue and append that to a temporary list
-            blue_temp = item.copy()
-            blue_temp.append("blue")
-            temp_colours.append(blue_temp)
-            # For each colour list add red and append that to a temporary list
-            red_temp = item.copy()
-            red_temp.append("red")
-            temp_colours.append(red_temp)
-        # Update the colour lists so far using the temporary list
-        colours = temp_colours
-    return colours
+    return colour_options.iterate_colour_options(graph, ["blue", "red"])
 
 
 # Returns the most frequent occurrence or a tie. Only works for 2 different elements in the list.
@@ -75,12 +48,25 @@ def most_frequent(majority_list):
     return result
 
 
+# Determine the global opinion of a colouring given by colour names or integer-coded (see colour_codes). For an
+# integer-coded colouring the opinion is BLUE, RED or TIE from batched_illusions.
+def global_majority_winner(colouring):
+    if isinstance(colouring, np.ndarray):
+        return gray_code_search.local_majority_winner(int(np.count_nonzero(colouring)), len(colouring))
+    return most_frequent(colouring)
+
+
 # Check for a given node, graph and colouring whether there is a majority illusion for that node.
 # Boolean weak is used to determine what should happen in cases with ties in the local or global opinion.
-def check_majority_illusion_node(graph, node, colouring, weak):
-    neighbours = list(graph.neighbors(node))
+# The global opinion is the same for every node, so it can be given if it has already been determined.
+# The colouring can be given by colour names or integer-coded (see colour_codes).
+def check_majority_illusion_node(graph, node, colouring, weak, majority_colouring_global=None):
+    if isinstance(colouring, np.ndarray):
+        return check_majority_illusion_node_codes(graph, node, colouring, weak, majority_colouring_global)
+    neighbours = graph.neighbors(node)
     # Determine the global opinion
-    majority_colouring_global = most_frequent(colouring)
+    if majority_colouring_global is None:
+        majority_colouring_global = most_frequent(colouring)
     colours_neighbours = []
     for neighbour in neighbours:
         colours_neighbours.append(colouring[neighbour])
@@ -101,41 +87,115 @@ def check_majority_illusion_node(graph, node, colouring, weak):
     return illusion
 
 
-# Check for graphs whether there is a majority-weak-majority illusion for each colouring.
-# Prints the colourings for which this is the case or plots the graph if no such colouring exists.
-def general_graph_check(graph, weak_illusion_node, weak_illusion_global):
-    colour_majority_illusion = False
-    colourings = all_colour_options_graph(graph)
-    # For each colouring check which nodes are under majority illusion
-    for col in colourings:
+# check_majority_illusion_node for an integer-coded colouring. The local opinion follows from the number of red
+# neighbours, so no colours are counted by name.
+def check_majority_illusion_node_codes(graph, node, colouring, weak, majority_colouring_global=None):
+    if majority_colouring_global is None:
+        majority_colouring_global = global_majority_winner(colouring)
+    colours_neighbours = colour_codes.neighbour_colours(graph, node, colouring)
+    # If there are no neighbours, the agent sees a tie.
+    majority_colour_neighbours = gray_code_search.local_majority_winner(int(np.count_nonzero(colours_neighbours)),
+                                                                        len(colours_neighbours))
+    # If you require a strict majority illusion, then there is no illusion if either globally or locally there is a tie
+    if not weak and TIE in (majority_colour_neighbours, majority_colouring_global):
+        return False
+    return majority_colour_neighbours != majority_colouring_global
+
+
+# Engines that yield the rank of every colouring with a (weak-)majority-(weak)-majority illusion together with the
+# number of nodes under illusion.
+ENGINES = {
+    "batched": batched_illusions.iterate_majority_majority_illusions,
+    "gray_code": gray_code_search.iterate_majority_majority_illusions,
+    "symmetry_reduced": symmetry_reduction.iterate_majority_majority_illusions,
+    "branch_and_bound": branch_and_bound.iterate_majority_majority_illusions,
+    "bit_sliced": bit_sliced_illusions.iterate_majority_majority_illusions,
+}
+
+
+# Iterate over the colourings of a graph that lead to a (weak-)majority-(weak)-majority illusion. Yields each such
+# colouring together with the graph-level result, which is "tie" if exactly half of the nodes are under illusion.
+# The method "per_node" checks every node of every colouring separately, "batched" checks blocks of colourings at once
+# and "gray_code" walks through the colourings in Gray-code order, flipping one node per step. "symmetry_reduced" checks
+# one colouring per orbit under the graph automorphisms and the colour swap. "branch_and_bound" searches the colourings
+# per number of red nodes and prunes partial colourings that can no longer lead to an illusion. "bit_sliced" packs 64
+# colourings into every machine word and checks them with bitwise operations, for graphs with at most 64 nodes. Only
+# "per_node", "batched" and "bit_sliced" yield the colourings in the order of all_colour_options_graph.
+def iterate_majority_majority_illusions(graph, weak_illusion_node, weak_illusion_global, method="per_node"):
+    if method in ENGINES:
+        for rank, illusion_count in ENGINES[method](graph, weak_illusion_node, weak_illusion_global):
+            col = colour_options.colour_option(rank, graph, ["blue", "red"])
+            if 2 * illusion_count == len(graph.nodes):
+                yield col, "tie"
+            else:
+                yield col, True
+        return
+    # For each colouring check which nodes are under majority illusion. The colourings are generated one at a time.
+    for col in all_colour_options_graph(graph):
         majority_illusion_colouring = []
+        majority_colouring_global = most_frequent(col)
         for agent in graph.nodes():
-            majority_illusion_node = check_majority_illusion_node(graph, agent, col, weak_illusion_node)
+            majority_illusion_node = check_majority_illusion_node(graph, agent, col, weak_illusion_node,
+                                                                  majority_colouring_global)
             majority_illusion_colouring.append(majority_illusion_node)
         majority_majority_illusion = most_frequent(majority_illusion_colouring)
         if majority_majority_illusion == "tie":
             if weak_illusion_global:
-                print(col)
-                print("There is a weak-majority-(weak)-majority illusion")
-                colour_majority_illusion = True
-            # else:
-            #    print("There is NO weak-majority-(weak)-majority illusion")
-        else:
-            if majority_majority_illusion:
-                print(col)
-                print("There is a majority-(weak)-majority illusion")
-                colour_majority_illusion = True
-            # else:
-            #    print("There is NO majority-(weak)-majority illusion")
+                yield col, majority_majority_illusion
+        elif majority_majority_illusion:
+            yield col, majority_majority_illusion
+
+
+# Answer a query about the colourings of a graph with a (weak-)majority-(weak)-majority illusion without printing them.
+# The mode is one of illusion_queries.QUERY_MODES and the method one of ENGINES, or "per_node". At most max_witnesses
+# ranks of colourings with an illusion are returned (see colour_options.colour_option to turn them into colourings)
+# and the ranks of all colourings that were found can be written to a sink from illusion_queries. A "histogram" query
+# checks all colourings in blocks with the batched engine, or with the method "tree_decomposition" counts them with
+# tree_decomposition_count, which handles large sparse graphs but gives no witnesses.
+# Returns a dictionary with the summary counters, see illusion_queries.empty_result.
+def query_majority_majority_illusions(graph, weak_illusion_node, weak_illusion_global, mode="exists", method="batched",
+                                      max_witnesses=10, sink=None):
+    num_nodes = len(graph.nodes)
+    if mode == "histogram":
+        def is_illusion(illusion_counts):
+            return batched_illusions.majority_majority_illusions(illusion_counts, num_nodes, weak_illusion_global)
+        if method == "tree_decomposition":
+            if sink is not None:
+                raise ValueError("The tree decomposition counts colourings without finding them, so it has no ranks "
+                                 "for a sink.")
+            histogram = tree_decomposition_count.illusion_count_distribution(graph, weak_illusion_node)
+            return illusion_queries.histogram_result(histogram, is_illusion)
+        count_blocks = batched_illusions.iterate_majority_illusion_counts(graph, weak_illusion_node)
+        return illusion_queries.illusion_count_histogram(count_blocks, num_nodes, is_illusion, max_witnesses, sink)
+    if method == "per_node":
+        illusions = ((colour_options.colour_option_rank(col, ["blue", "red"]), majority_majority_illusion)
+                     for col, majority_majority_illusion in
+                     iterate_majority_majority_illusions(graph, weak_illusion_node, weak_illusion_global))
+    else:
+        illusions = ENGINES[method](graph, weak_illusion_node, weak_illusion_global)
+    return illusion_queries.query_illusions(illusions, mode, max_witnesses, sink)
+
+
+# Check for graphs whether there is a majority-weak-majority illusion for each colouring.
+# Prints the number of colourings for which this is the case together with at most max_printed of them, or plots the
+# graph if no such colouring exists.
+def general_graph_check(graph, weak_illusion_node, weak_illusion_global, method="per_node", max_printed=10):
+    result = query_majority_majority_illusions(graph, weak_illusion_node, weak_illusion_global, "count", method,
+                                               max_printed)
+    for rank in result["witnesses"]:
+        print(colour_options.colour_option(rank, graph, ["blue", "red"]))
+    colour_majority_illusion = result["exists"]
 
     if colour_majority_illusion:
+        print(result["count"], "colourings lead to a majority-weak-majority illusion, of which",
+              len(result["witnesses"]), "are printed above")
         print("For this graph, there exists some colouring that leads to a majority-weak-majority illusion")
     else:
         print("For this graph, there DOES NOT exist a colouring that leads to a majority-weak-majority illusion")
         print(graph.nodes)
         print(graph.edges)
         # Plot the graph using the first colour list
-        plot_graph(graph, colourings[0])
+        plot_graph(graph, len(graph.nodes) * ["blue"])
     return colour_majority_illusion
 
 
@@ -153,6 +213,8 @@ def nudge(pos, x_shift, y_shift):
 
 # Plot the network in a nice way.
 def plot_graph(graph, colour_map):
+    graph = csr_graph.as_networkx(graph)
+    colour_map = colour_codes.decode_colouring(colour_map, ["blue", "red"])
     fig, ax = plt.subplots(1, 1, figsize=(12, 6))
     pos = nx.spring_layout(graph)
     nx.draw_networkx(graph, with_labels=False, pos=pos, ax=ax, node_color=colour_map, arrowsize=20)  # default labeling
@@ -162,13 +224,20 @@ def plot_graph(graph, colour_map):
     return
 
 
-# Keeps checking generated digraphs with 7 nodes until one has been found without a majority-weak-majority illusion.
-def check_random_graphs():
-    graph_majority_illusion = True
-    while graph_majority_illusion:
-        digraph = create_random_directed_graph(7)
-        graph_majority_illusion = general_graph_check(digraph, weak_node_illusion, weak_global_illusion)
-    return
+# Check whether the random digraph created from a seed has no colouring with a majority-(weak)-majority illusion.
+def no_majority_illusion_for_seed(seed_number, nodes, weak_illusion_node, weak_illusion_global):
+    digraph = create_random_directed_graph(nodes, seed_number)
+    illusions = iterate_majority_majority_illusions(digraph, weak_illusion_node, weak_illusion_global, "batched")
+    return next(illusions, None) is None
+
+
+# Check random digraphs on all processors until one has been found without a majority-(weak)-majority illusion. The
+# checked seeds are recorded in a results file, so a next run continues where this one stopped.
+def check_random_graphs(weak_illusion_node, weak_illusion_global, results_path="majority_illusion_seeds.jsonl"):
+    seed_number = counter_example_search.search_seeds(no_majority_illusion_for_seed,
+                                                      (7, weak_illusion_node, weak_illusion_global), results_path)
+    digraph = create_random_directed_graph(7, seed_number)
+    general_graph_check(digraph, weak_illusion_node, weak_illusion_global, "batched")
 
 
 if __name__ == "__main__":
@@ -182,5 +251,5 @@ if __name__ == "__main__":
     # majority-weak-majority illusion.
     check_random = False
     if check_random:
-        check_random_graphs()
+        check_random_graphs(weak_node_illusion, weak_global_illusion)
 
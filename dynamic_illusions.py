@@ -1,61 +1,38 @@
 
-import random
 from collections import Counter
 import networkx as nx
+import numpy as np
 from matplotlib import pyplot as plt
 
+import attractor_census
+import batched_illusions
+import branch_and_bound
+import colour_codes
+import colour_options
+import csr_graph
+import gray_code_search
+import illusion_profile
+import majority_dynamics
+import random_digraphs
 import regular_graph_maj_maj_illusion
+from batched_illusions import TIE
 from regular_graph_maj_maj_illusion import create_regular_maj_maj_ill_graph
 
+# The labels of the nodes in this file start at 1, as in regular_graph_maj_maj_illusion.py: the colour of the node with
+# label v is at position v - LABEL_OFFSET of a colouring.
+LABEL_OFFSET = 1
+
 
 # Create a random directed graph using a specified number of nodes.
-def create_random_directed_graph(nodes):
-    # graph = nx.scale_free_graph(nodes)
-    graph = nx.random_k_out_graph(nodes, 3, alpha=0.5, self_loops=False)
-    temp_graph = graph.copy()
-    for node in graph.nodes():
-        neighbours = list(graph.neighbors(node))
-        temp_graph = graph.copy()
-        # Make sure the digraph does not contain multiple edges between 2 nodes
-        for neighbour in neighbours:
-            counter = 0
-            for edge in temp_graph.edges():  # Loop over the edges
-                if edge == (node, neighbour):  # Count how many times the current (node,neighbour) edge appears
-                    counter = counter + 1
-            while counter > 1:  # While there is more than 1 of the same (node, neighbour) edge, remove the edge
-                temp_graph.remove_edges_from([(node, neighbour)])
-                counter = counter - 1
-        if node in neighbours:  # Remove self-loops
-            temp_graph.remove_edges_from([(node, node)])
-            neighbours.remove(node)
-        graph = temp_graph.copy()
-        if not neighbours:  # Ensure every node has a neighbour
-            temp_graph = graph.copy()
-            random_node = random.randint(0, len(graph.nodes()))
-            if random_node != node:
-                temp_graph.add_edge(node, random_node)
-    graph = temp_graph.copy()
-    # nx.draw(graph)
-    # plt.show()
-    return graph
-
-
-# Create all possible ways to colour a graph using two colours
+def create_random_directed_graph(nodes, seed_number=None):
+    # Every node gets 3 random neighbours among the other nodes, where a neighbour drawn twice becomes one edge, so the
+    # digraph has no self-loops or multiple edges and every node has a neighbour.
+    return random_digraphs.create_random_k_out_digraph(nodes, 3, seed_number, LABEL_OFFSET)
+
+
+# Lazily iterate over all possible ways to colour a graph using two colours
 def all_colour_options_graph(graph):
-    colour_list = [[]]
-    # Loop over the nodes
-    for node in range(len(graph.nodes)):
-        temp_colours = []
-        # Loop over the colour lists so far
-        for item in colour_list:
-            # Add each of the 2 colours to all the colour lists so far
-            for colour in ["blue", "red"]:
-                temp_colour_list = item.copy()
-                temp_colour_list.append(colour)
-                temp_colours.append(temp_colour_list)
-        # Update the colour lists so far using the temporary list
-        colour_list = temp_colours
-    return colour_list
+    return colour_options.iterate_colour_options(graph, ["blue", "red"])
 
 
 # Returns the most frequent occurrence or a tie. Only works for 2 different elements in the list.
@@ -76,14 +53,27 @@ def most_frequent(majority_list):
     return result
 
 
+# Determine the global opinion of a colouring given by colour names or integer-coded (see colour_codes). For an
+# integer-coded colouring the opinion is BLUE, RED or TIE from batched_illusions.
+def global_majority_winner(colouring):
+    if isinstance(colouring, np.ndarray):
+        return gray_code_search.local_majority_winner(int(np.count_nonzero(colouring)), len(colouring))
+    return most_frequent(colouring)
+
+
 # Check for a given node, graph and colouring whether there is a majority illusion for that node.
-def check_majority_illusion_node(graph, node, colouring):
-    neighbours = list(graph.neighbors(node))
+# The global opinion is the same for every node, so it can be given if it has already been determined.
+# The colouring can be given by colour names or integer-coded (see colour_codes).
+def check_majority_illusion_node(graph, node, colouring, majority_colouring_global=None):
+    if isinstance(colouring, np.ndarray):
+        return check_majority_illusion_node_codes(graph, node, colouring, majority_colouring_global)
+    neighbours = graph.neighbors(node)
     # Determine the global opinion
-    majority_colouring_global = most_frequent(colouring)
+    if majority_colouring_global is None:
+        majority_colouring_global = most_frequent(colouring)
     colours_neighbours = []
-    for neighbour in neighbours:  # Note: neighbour - 1, since the labels of nodes start at 1 here.
-        colours_neighbours.append(colouring[neighbour - 1])
+    for neighbour in neighbours:
+        colours_neighbours.append(colouring[neighbour - LABEL_OFFSET])
     if colours_neighbours:
         # Determine the local opinion
         majority_colour_neighbours = most_frequent(colours_neighbours)
@@ -101,38 +91,87 @@ def check_majority_illusion_node(graph, node, colouring):
     return illusion
 
 
-# Determine if there is a majority-majority illusion for some colouring
+# check_majority_illusion_node for an integer-coded colouring. The local opinion follows from the number of red
+# neighbours, so no colours are counted by name.
+def check_majority_illusion_node_codes(graph, node, colouring, majority_colouring_global=None):
+    if majority_colouring_global is None:
+        majority_colouring_global = global_majority_winner(colouring)
+    # The labels of nodes start at 1 here.
+    colours_neighbours = colour_codes.neighbour_colours(graph, node, colouring, label_offset=LABEL_OFFSET)
+    # If there are no neighbours, the agent sees a tie.
+    majority_colour_neighbours = gray_code_search.local_majority_winner(int(np.count_nonzero(colours_neighbours)),
+                                                                        len(colours_neighbours))
+    # The node is not under majority illusion if either globally or locally there is a tie
+    if TIE in (majority_colour_neighbours, majority_colouring_global):
+        return False
+    return majority_colour_neighbours != majority_colouring_global
+
+
+# Determine if there is a majority-majority illusion for some colouring. The global opinion is determined once and all
+# nodes are checked in one sweep (see illusion_profile).
 def check_majority_majority_illusion_graph(graph, colouring):
-    list_maj_ill_node = []
-    for agent in graph.nodes():
-        maj_ill_node = check_majority_illusion_node(graph, agent, colouring)
-        list_maj_ill_node.append(maj_ill_node)
-    majority_majority_illusion = most_frequent(list_maj_ill_node)
-    if majority_majority_illusion == "tie":
-        majority_majority_illusion = False
+    majority_majority_illusion, _, _, _ = illusion_profile.illusion_profile(graph, colouring, "majority", 2,
+                                                                            ["blue", "red"], label_offset=LABEL_OFFSET)
     return majority_majority_illusion
 
 
+# Iterate over the results of check_majority_majority_illusion_graph for all colourings of a graph, in the order of
+# all_colour_options_graph. The colourings are checked in blocks by the batched illusion engine.
+def iterate_majority_majority_illusion_flags(graph):
+    for _, illusion_counts in batched_illusions.iterate_majority_illusion_counts(graph, False, LABEL_OFFSET):
+        for maj_maj_illusion in batched_illusions.majority_majority_illusions(illusion_counts, len(graph.nodes), False):
+            yield bool(maj_maj_illusion)
+
+
+# Count the colourings of a graph with a majority-majority illusion. The colourings are walked through in Gray-code
+# order, so that each colouring only costs an update of the nodes that have the recoloured node as a neighbour.
+def count_majority_majority_illusion_colourings(graph):
+    return sum(1 for _ in gray_code_search.iterate_majority_majority_illusions(graph, False, False, LABEL_OFFSET))
+
+
+# Check whether some colouring of the graph leads to a majority-majority illusion. The colourings are searched per
+# number of red nodes and partial colourings are pruned as soon as a majority of nodes under illusion can no longer be
+# reached.
+def exists_majority_majority_illusion_colouring(graph):
+    for _ in branch_and_bound.iterate_majority_majority_illusions(graph, False, False, LABEL_OFFSET):
+        return True
+    return False
+
+
 # Update step using a majority threshold. The colours of the nodes will be changed to the local majority winner.
+# The colouring can be given by colour names or integer-coded (see colour_codes). To run the update until the colouring
+# no longer changes, use majority_dynamics.run_majority_dynamics.
 def majority_threshold_update(graph, colouring):
-    new_colouring_graph = []
+    if isinstance(colouring, np.ndarray):
+        return majority_threshold_update_codes(graph, colouring)
+    new_colouring_graph = list(colouring)
     for agent in graph.nodes():
-        neighbours = list(graph.neighbors(agent))
+        neighbours = graph.neighbors(agent)
         colours_neighbours = []
         for neighbour in neighbours:
-            colours_neighbours.append(colouring[neighbour - 1])
+            colours_neighbours.append(colouring[neighbour - LABEL_OFFSET])
         # Determine the local majority winner among the neighbours if there are neighbours.
         if colours_neighbours:
             majority_colour_neighbours = most_frequent(colours_neighbours)
         else:  # If there are no neighbours, the agents sees a tie.
             majority_colour_neighbours = "tie"
-        if majority_colour_neighbours == "tie":  # The colour of the node remains the same.
-            new_colouring_graph.append(colouring[agent])
-        else:  # The colour of the node will be changed to the local majority winner.
-            new_colouring_graph.append(majority_colour_neighbours)
-    print("Old vs. new colouring:")
-    print(colouring)
-    print(new_colouring_graph)
+        # If there is a tie, the colour of the node remains the same. Otherwise the colour of the node will be changed
+        # to the local majority winner.
+        if majority_colour_neighbours != "tie":
+            new_colouring_graph[agent - LABEL_OFFSET] = majority_colour_neighbours
+    return new_colouring_graph
+
+
+# majority_threshold_update for an integer-coded colouring. Returns the new integer-coded colouring.
+def majority_threshold_update_codes(graph, colouring):
+    new_colouring_graph = colouring.copy()
+    for agent in graph.nodes():
+        colours_neighbours = colour_codes.neighbour_colours(graph, agent, colouring, label_offset=LABEL_OFFSET)
+        majority_colour_neighbours = gray_code_search.local_majority_winner(int(np.count_nonzero(colours_neighbours)),
+                                                                            len(colours_neighbours))
+        # If there is a tie (or there are no neighbours), the colour of the node remains the same.
+        if majority_colour_neighbours != TIE:
+            new_colouring_graph[agent - LABEL_OFFSET] = majority_colour_neighbours
     return new_colouring_graph
 
 
@@ -143,6 +182,8 @@ def nudge(pos, x_shift, y_shift):
 
 # Plot the network in a nice way.
 def plot_graph(graph, colour_map):
+    graph = csr_graph.as_networkx(graph)
+    colour_map = colour_codes.decode_colouring(colour_map, ["blue", "red"])
     fig, ax = plt.subplots(1, 1, figsize=(12, 6))
     pos = nx.spring_layout(graph)
     nx.draw_networkx(graph, with_labels=False, pos=pos, ax=ax, node_color=colour_map, arrowsize=20)  # default labeling
@@ -155,22 +196,23 @@ def plot_graph(graph, colour_map):
 def check_for_randomly_created_graph():
     maj_maj_illusion = False
     graph = nx.empty_graph
-    colour_options = []
     while not maj_maj_illusion:
         # Create a random regular graph with 10 nodes and 3 neighbours for each node.
         graph = nx.random_regular_graph(3, 14)
-        colour_options = all_colour_options_graph(graph)
-        # Check until a colouring with majority-majority illusion has been found
-        for colouring_graph in colour_options:
-            maj_maj_illusion = check_majority_majority_illusion_graph(graph, colouring_graph)
+        graph = nx.convert_node_labels_to_integers(graph, first_label=LABEL_OFFSET)
+        # Check until a colouring with majority-majority illusion has been found. Whether there is a majority-majority
+        # illusion is determined for blocks of colourings at once.
+        for colouring_graph, maj_maj_illusion in zip(all_colour_options_graph(graph),
+                                                     iterate_majority_majority_illusion_flags(graph)):
             # For that colouring do a majority threshold update step
             # if maj_maj_illusion:
             new_colouring = majority_threshold_update(graph, colouring_graph)
             print(maj_maj_illusion)
         # Check if the new graph has certain properties:
         # majority-majority illusion, what colour is global majority winner etc. How often do these properties occur
-        # among colourings that are a majority-majority illusion?
-    plot_graph(graph, colour_options[0])
+        # among colourings that are a majority-majority illusion? This is counted over many random regular graphs by
+        # illusion_persistence.illusion_persistence_statistics.
+    plot_graph(graph, len(graph.nodes) * ["blue"])
     print(graph.nodes())
     print(graph.edges())
     return
@@ -184,6 +226,16 @@ if __name__ == "__main__":
     maj_maj_ill = check_majority_majority_illusion_graph(regular_graph, colours)
     print(maj_maj_ill)
     new_colours = majority_threshold_update(regular_graph, colours)
+    print("Old vs. new colouring:")
+    print(colours)
+    print(new_colours)
     plot_graph(regular_graph, new_colours)
     updated_maj_maj_ill = check_majority_majority_illusion_graph(regular_graph, new_colours)
     print(updated_maj_maj_ill)
+    # Keep updating until the colouring no longer changes or alternates between two colourings.
+    dynamics = majority_dynamics.run_majority_dynamics(regular_graph, colours, 100,
+                                                       majority_dynamics.print_step_statistics, LABEL_OFFSET)
+    print(dynamics["outcome"], "reached after", dynamics["convergence_time"], "steps")
+    # Where do all other colourings of this graph end up, and do their illusions survive?
+    census = attractor_census.attractor_census(regular_graph, LABEL_OFFSET)
+    attractor_census.print_attractor_census(census, regular_graph)
@@ -0,0 +1,62 @@
+from batched_illusions import BLUE, RED, TIE
+
+
+# Determine the majority winner among the neighbours of a node from its number of red neighbours and its degree.
+def local_majority_winner(red_neighbours, degree):
+    if 2 * red_neighbours > degree:
+        return RED
+    if 2 * red_neighbours < degree:
+        return BLUE
+    return TIE
+
+
+# The number of nodes under majority illusion, given how many nodes see a local BLUE, RED or TIE winner and what the
+# global winner is. Boolean weak is used in the same way as in check_majority_illusion_node.
+def number_of_illusions(local_winner_counts, global_winner, num_nodes, weak):
+    if weak:
+        return num_nodes - local_winner_counts[global_winner]
+    if global_winner == TIE:
+        return 0
+    return local_winner_counts[BLUE if global_winner == RED else RED]
+
+
+# Walk through all two-colourings of a graph in Gray-code order, so that every step flips the colour of exactly one
+# node. The number of red neighbours of every node and the number of nodes with a local BLUE, RED or TIE winner are
+# updated only for the predecessors of the flipped node, so every step costs O(in-degree) instead of O(n * degree).
+# Yields the rank of every colouring (as used by colour_options.colour_option) with a (weak-)majority-(weak)-majority
+# illusion together with the number of nodes under illusion. The colourings are not yielded in order of rank.
+def iterate_majority_majority_illusions(graph, weak_node, weak_global, label_offset=0):
+    num_nodes = len(graph.nodes)
+    degrees = [0] * num_nodes
+    predecessors = [[] for _ in range(num_nodes)]
+    for node in graph.nodes():
+        for neighbour in graph.neighbors(node):
+            degrees[node - label_offset] = degrees[node - label_offset] + 1
+            predecessors[neighbour - label_offset].append(node - label_offset)
+    # Start with the colouring in which every node is blue.
+    colouring = [BLUE] * num_nodes
+    red_neighbours = [0] * num_nodes
+    local_winners = [local_majority_winner(0, degree) for degree in degrees]
+    local_winner_counts = [local_winners.count(BLUE), local_winners.count(RED), local_winners.count(TIE)]
+    num_red = 0
+    rank = 0
+    for step in range(2 ** num_nodes):
+        if step > 0:
+            # The bit that changes in the Gray code belongs to the node at position num_nodes - 1 - bit.
+            bit = (step & -step).bit_length() - 1
+            rank = rank ^ (1 << bit)
+            flipped = num_nodes - 1 - bit
+            change = 1 if colouring[flipped] == BLUE else -1
+            colouring[flipped] = RED if change == 1 else BLUE
+            num_red = num_red + change
+            for node in predecessors[flipped]:
+                red_neighbours[node] = red_neighbours[node] + change
+                new_winner = local_majority_winner(red_neighbours[node], degrees[node])
+                if new_winner != local_winners[node]:
+                    local_winner_counts[local_winners[node]] = local_winner_counts[local_winners[node]] - 1
+                    local_winner_counts[new_winner] = local_winner_counts[new_winner] + 1
+                    local_winners[node] = new_winner
+        global_winner = local_majority_winner(num_red, num_nodes)
+        illusion_count = number_of_illusions(local_winner_counts, global_winner, num_nodes, weak_node)
+        if 2 * illusion_count > num_nodes or (weak_global and 2 * illusion_count == num_nodes):
+            yield rank, illusion_count
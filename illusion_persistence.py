@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+
+import networkx as nx
+import numpy as np
+
+import batched_illusions
+import colour_options
+from batched_illusions import TIE
+
+# Number of colourings of a graph that are checked and updated at once.
+BLOCK_SIZE = 2 ** 12
+# The global winner after the update steps compared with the global winner of the colouring with the illusion.
+GLOBAL_OUTCOMES = ("same", "flipped", "tie")
+
+
+# The random regular graph with the given index in a run. Graph i is drawn with a seed taken from a generator seeded
+# with (seed, i), so every graph of a run can be created again on its own.
+def create_regular_graph(degree, num_nodes, seed, graph_index):
+    graph_seed = int(np.random.default_rng([seed, graph_index]).integers(2 ** 32))
+    return nx.random_regular_graph(degree, num_nodes, seed=graph_seed)
+
+
+# Empty statistics for graphs with num_nodes nodes and the given number of update steps. Row s of the arrays describes
+# the colourings after s + 1 steps: how many still have a majority-majority illusion, how many have each global outcome
+# of GLOBAL_OUTCOMES and how many have each number of nodes whose colour differs from the colouring they started from.
+def empty_statistics(num_nodes, steps):
+    return {"graphs": 0, "graphs_with_illusion": 0, "colourings": 0, "illusion_colourings": 0,
+            "persists": np.zeros(steps, dtype=np.int64),
+            "global_outcomes": np.zeros((steps, len(GLOBAL_OUTCOMES)), dtype=np.int64),
+            "changed_nodes": np.zeros((steps, num_nodes + 1), dtype=np.int64)}
+
+
+def add_statistics(totals, statistics):
+    for key, value in statistics.items():
+        totals[key] = totals[key] + value
+
+
+# Keep the colourings of a block that have a majority-majority illusion and apply steps majority threshold updates (as
+# in dynamic_illusions.py) to all of them at once. The local winners of a colouring give both its illusion check and its
+# update, so every step costs one matrix product for the whole block. Returns the statistics of the block.
+def block_statistics(adjacency, colourings, steps):
+    num_nodes = colourings.shape[1]
+    statistics = empty_statistics(num_nodes, steps)
+    local_winners, illusions = batched_illusions.local_winners_and_illusions(adjacency, colourings)
+    initial = colourings[illusions]
+    local_winners = local_winners[illusions]
+    initial_winners = batched_illusions.majority_winners(initial.sum(axis=1), num_nodes)
+    current = initial
+    for step in range(steps):
+        current = np.where(local_winners == TIE, current, local_winners).astype(np.uint8)
+        local_winners, step_illusions = batched_illusions.local_winners_and_illusions(adjacency, current)
+        global_winners = batched_illusions.majority_winners(current.sum(axis=1), num_nodes)
+        # The colourings with an illusion have a global winner, so the outcome is the same, the other colour or a tie.
+        global_outcomes = np.where(global_winners == TIE, 2, (global_winners != initial_winners).astype(np.int64))
+        statistics["persists"][step] = np.count_nonzero(step_illusions)
+        statistics["global_outcomes"][step] = np.bincount(global_outcomes, minlength=len(GLOBAL_OUTCOMES))
+        statistics["changed_nodes"][step] = np.bincount((current != initial).sum(axis=1), minlength=num_nodes + 1)
+    statistics["colourings"] = len(colourings)
+    statistics["illusion_colourings"] = len(initial)
+    return statistics
+
+
+# Create one random regular graph and go through all of its colourings in blocks, so only one block is held in memory.
+# Runs in a worker process. Returns the index of the graph and its statistics.
+def graph_statistics(arguments):
+    degree, num_nodes, seed, graph_index, steps, block_size = arguments
+    graph = create_regular_graph(degree, num_nodes, seed, graph_index)
+    adjacency = batched_illusions.adjacency_matrix(graph)
+    statistics = empty_statistics(num_nodes, steps)
+    for _, colourings in colour_options.iterate_colour_option_blocks(graph, 2, block_size):
+        add_statistics(statistics, block_statistics(adjacency, colourings, steps))
+    statistics["graphs"] = 1
+    statistics["graphs_with_illusion"] = int(statistics["illusion_colourings"] > 0)
+    return graph_index, statistics
+
+
+# Count how often majority-majority illusions persist under the majority threshold update on many random
+# degree-regular graphs with num_nodes nodes, such as the 3-regular graphs with 14 nodes of
+# dynamic_illusions.check_for_randomly_created_graph. For every graph, all colourings are checked, the colourings with
+# a majority-majority illusion are updated steps times, and the outcomes are added to histograms (see
+# empty_statistics). The graphs are spread over a pool of worker processes and only the statistics are sent back, so the
+# memory use does not grow with the number of graphs. The statistics of every graph are passed to on_graph as soon as
+# they are known. If no seed is given a random one is chosen. Returns the summed statistics with the seed.
+def illusion_persistence_statistics(num_graphs, num_nodes=14, degree=3, steps=1, seed=None, processes=None,
+                                    block_size=BLOCK_SIZE, on_graph=None):
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy)
+    if processes is None:
+        processes = os.cpu_count()
+    totals = empty_statistics(num_nodes, steps)
+    tasks = ((degree, num_nodes, seed, graph_index, steps, block_size) for graph_index in range(num_graphs))
+    if processes == 1:
+        for graph_index, statistics in map(graph_statistics, tasks):
+            add_statistics(totals, statistics)
+            if on_graph is not None:
+                on_graph(graph_index, statistics)
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            for graph_index, statistics in pool.imap_unordered(graph_statistics, tasks):
+                add_statistics(totals, statistics)
+                if on_graph is not None:
+                    on_graph(graph_index, statistics)
+    totals["seed"] = seed
+    return totals
+
+
+def print_persistence_statistics(statistics):
+    print(statistics["graphs_with_illusion"], "of", statistics["graphs"], "graphs have a majority-majority illusion,",
+          statistics["illusion_colourings"], "of", statistics["colourings"], "colourings")
+    for step in range(len(statistics["persists"])):
+        print("after", step + 1, "steps: illusion persists", statistics["persists"][step], "global winner",
+              dict(zip(GLOBAL_OUTCOMES, statistics["global_outcomes"][step].tolist())), "changed nodes",
+              dict(enumerate(statistics["changed_nodes"][step].tolist())))
@@ -0,0 +1,113 @@
+import numpy as np
+
+import colour_codes
+from colour_codes import RED, TIE
+
+# The kinds of illusion that can be profiled.
+KINDS = ("majority", "plurality", "quota")
+
+
+# Determine which nodes are under strict and under weak illusion from the number of neighbours with each colour of every
+# node and the number of nodes with each colour. Works on one colouring, with neighbour counts of shape (n, q) and
+# global counts of shape (q,), or on a batch of colourings with a batch axis in front of both. For "majority" the
+# colours are blue and red, a node without neighbours sees a tie and a strict illusion needs a winner both locally and
+# globally. For "plurality" and "quota" a node without neighbours has no local winners, and a strict quota illusion
+# needs local and global quota winners. Returns two boolean arrays of the shape of the neighbour counts without the
+# colour axis.
+def illusion_nodes(neighbour_counts, global_counts, kind, quota=None):
+    if kind == "majority":
+        local_winners = colour_codes.majority_winners(neighbour_counts[..., RED], neighbour_counts.sum(axis=-1))
+        global_winner = colour_codes.majority_winners(global_counts[..., RED], global_counts.sum(axis=-1))
+        global_winner = global_winner[..., np.newaxis]
+        weak_illusions = local_winners != global_winner
+        strict_illusions = weak_illusions & (local_winners != TIE) & (global_winner != TIE)
+    elif kind == "plurality":
+        local_winners = colour_codes.plurality_winner_masks(neighbour_counts)
+        global_winners = colour_codes.plurality_winner_masks(global_counts)[..., np.newaxis]
+        weak_illusions = local_winners != global_winners
+        strict_illusions = local_winners & global_winners == 0
+    elif kind == "quota":
+        local_winners = colour_codes.quota_winner_masks(neighbour_counts, quota)
+        global_winners = colour_codes.quota_winner_masks(global_counts, quota)[..., np.newaxis]
+        weak_illusions = local_winners != global_winners
+        strict_illusions = (local_winners != 0) & (local_winners & global_winners == 0) & (global_winners != 0)
+    else:
+        raise ValueError("Unknown kind of illusion: " + str(kind) + ". Choose from " + ", ".join(KINDS) + ".")
+    return strict_illusions, weak_illusions
+
+
+# Count the nodes under strict and under weak illusion for one colouring in a single sweep. The global colour counts
+# are determined once and the neighbour colour counts of all nodes at once, so a colouring costs O(n + m) instead of
+# determining the global winners again for every node. The colouring can be given by colour names or integer-coded
+# (see colour_codes). The kinds of illusion are as in illusion_nodes.
+# Returns the number of nodes under strict illusion and the number of nodes under weak illusion.
+def node_illusion_counts(graph, colouring, kind, colours, quota=None, label_offset=0):
+    colouring = colour_codes.encode_colouring(colouring, colours)
+    neighbour_counts = colour_codes.neighbour_colour_counts(graph, colouring, len(colours), label_offset)
+    global_counts = colour_codes.colour_counts(colouring, len(colours))
+    strict_illusions, weak_illusions = illusion_nodes(neighbour_counts, global_counts, kind, quota)
+    return int(np.count_nonzero(strict_illusions)), int(np.count_nonzero(weak_illusions))
+
+
+# Determine from the number of nodes under illusion whether more than a 1/k-fraction of the nodes is under illusion,
+# and whether at least a 1/k-fraction is (the weak graph threshold).
+def k_fraction_illusions(illusion_count, num_nodes, k):
+    illusion_fraction = illusion_count / num_nodes
+    return illusion_fraction > 1 / k, illusion_fraction >= 1 / k
+
+
+# Determine all four variants of a graph-level illusion for one colouring at once. Returns, in this order, whether
+# there is a 1/k-X illusion, a 1/k-weak-X illusion, a weak-1/k-X illusion and a weak-1/k-weak-X illusion, where X is
+# the kind of illusion: the weak before 1/k means that exactly a 1/k-fraction of the nodes under illusion is enough,
+# the weak before X means that the nodes only need to be under weak illusion. With k = 2 and kind "majority" these are
+# the majority-majority illusions.
+def illusion_profile(graph, colouring, kind, k, colours, quota=None, label_offset=0):
+    strict_count, weak_count = node_illusion_counts(graph, colouring, kind, colours, quota, label_offset)
+    k_fraction_illusion, weak_k_fraction_illusion = k_fraction_illusions(strict_count, len(graph.nodes), k)
+    k_fraction_weak_illusion, weak_k_fraction_weak_illusion = k_fraction_illusions(weak_count, len(graph.nodes), k)
+    return k_fraction_illusion, k_fraction_weak_illusion, weak_k_fraction_illusion, weak_k_fraction_weak_illusion
+
+
+# Determine all four variants of a graph-level illusion for a batch of integer-coded colourings (one colouring per row)
+# of a csr_graph.CSRGraph at once, see illusion_profile. Returns a boolean array with one row per colouring and the
+# variants in the columns.
+def batch_illusion_profiles(graph, colourings, kind, k, num_colours, quota=None):
+    neighbour_counts = colour_codes.batch_neighbour_colour_counts(graph, colourings, num_colours)
+    global_counts = np.stack([np.count_nonzero(colourings == colour, axis=1) for colour in range(num_colours)], axis=1)
+    strict_illusions, weak_illusions = illusion_nodes(neighbour_counts, global_counts, kind, quota)
+    num_nodes = colourings.shape[1]
+    k_fraction_illusion, weak_k_fraction_illusion = k_fraction_illusions(strict_illusions.sum(axis=1), num_nodes, k)
+    k_fraction_weak_illusion, weak_k_fraction_weak_illusion = k_fraction_illusions(weak_illusions.sum(axis=1),
+                                                                                   num_nodes, k)
+    return np.stack([k_fraction_illusion, k_fraction_weak_illusion, weak_k_fraction_illusion,
+                     weak_k_fraction_weak_illusion], axis=1)
+
+
+# Count the nodes under strict and under weak quota illusion for several quotas at once. The neighbour and global colour
+# counts are shared by all quotas, so this costs about as much as counting for a single quota. Returns two arrays with
+# the number of nodes under strict and under weak quota illusion for every quota.
+def quota_illusion_counts(graph, colouring, quotas, colours, label_offset=0):
+    colouring = colour_codes.encode_colouring(colouring, colours)
+    neighbour_counts = colour_codes.neighbour_colour_counts(graph, colouring, len(colours), label_offset)
+    global_counts = colour_codes.colour_counts(colouring, len(colours))
+    quotas = np.asarray(quotas, dtype=np.float64)
+    # One row of local quota winners per quota.
+    local_winners = colour_codes.quota_winner_masks(neighbour_counts, quotas[:, np.newaxis, np.newaxis])
+    global_winners = colour_codes.quota_winner_masks(global_counts, quotas[:, np.newaxis])[:, np.newaxis]
+    weak_illusions = local_winners != global_winners
+    strict_illusions = (local_winners != 0) & (local_winners & global_winners == 0) & (global_winners != 0)
+    return np.count_nonzero(strict_illusions, axis=1), np.count_nonzero(weak_illusions, axis=1)
+
+
+# Determine all four variants of a graph-level quota illusion for every combination of a quota in quotas and a k in
+# ks at once. Returns a boolean array of shape (4, len(quotas), len(ks)) with the variants in the order of
+# illusion_profile.
+def quota_illusion_profiles(graph, colouring, quotas, ks, colours, label_offset=0):
+    strict_counts, weak_counts = quota_illusion_counts(graph, colouring, quotas, colours, label_offset)
+    ks = np.asarray(ks)[np.newaxis, :]
+    k_fraction_illusion, weak_k_fraction_illusion = k_fraction_illusions(strict_counts[:, np.newaxis],
+                                                                         len(graph.nodes), ks)
+    k_fraction_weak_illusion, weak_k_fraction_weak_illusion = k_fraction_illusions(weak_counts[:, np.newaxis],
+                                                                                   len(graph.nodes), ks)
+    return np.stack([k_fraction_illusion, k_fraction_weak_illusion, weak_k_fraction_illusion,
+                     weak_k_fraction_weak_illusion])
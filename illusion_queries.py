@@ -0,0 +1,132 @@
+import numpy as np
+
+# The questions that can be asked about the colourings of a graph with an illusion. "exists" stops at the first
+# colouring with an illusion, "count" counts all of them, "histogram" counts for every c from 0 to n how many of all
+# colourings have exactly c nodes under illusion and "witnesses" stops once max_witnesses colourings have been found.
+QUERY_MODES = ("exists", "count", "histogram", "witnesses")
+# Number of ranks that are collected before they are passed on to a sink at once.
+SINK_BLOCK_SIZE = 2 ** 12
+
+
+# Collects the ranks of the colourings with an illusion and saves them as a .npy file of int64 ranks when it is closed.
+class IndexSink:
+    def __init__(self, path):
+        self.path = path
+        self.blocks = []
+
+    def add(self, ranks):
+        self.blocks.append(np.asarray(ranks, dtype=np.int64))
+
+    def close(self):
+        ranks = np.concatenate(self.blocks) if self.blocks else np.zeros(0, dtype=np.int64)
+        np.save(self.path, ranks)
+
+
+# Marks the colourings with an illusion in a bitmap with one bit per colouring, bit r % 8 of byte r // 8 for the
+# colouring with rank r, and saves it as a .npy file of bytes when it is closed. For a graph with 20 nodes the bitmap
+# takes 128 KiB, whatever the number of colourings with an illusion.
+class BitmapSink:
+    def __init__(self, path, number_of_colourings):
+        self.path = path
+        self.bitmap = np.zeros(-(-number_of_colourings // 8), dtype=np.uint8)
+
+    def add(self, ranks):
+        ranks = np.asarray(ranks, dtype=np.int64)
+        np.bitwise_or.at(self.bitmap, ranks >> 3, np.left_shift(1, ranks & 7).astype(np.uint8))
+
+    def close(self):
+        np.save(self.path, self.bitmap)
+
+
+# Read the ranks of the colourings with an illusion back from a file written by an IndexSink or a BitmapSink.
+def load_illusion_ranks(path):
+    saved = np.load(path)
+    if saved.dtype == np.uint8:
+        return np.flatnonzero(np.unpackbits(saved, bitorder="little"))
+    return saved
+
+
+# A new query result. The summary counters are filled in as far as the mode needs them: count stays None if not all
+# colourings were checked and histogram stays None outside the "histogram" mode. At most max_witnesses ranks of
+# colourings with an illusion are kept in witnesses.
+def empty_result(mode):
+    if mode not in QUERY_MODES:
+        raise ValueError("Unknown query mode: " + str(mode) + ". Choose from " + ", ".join(QUERY_MODES) + ".")
+    return {"mode": mode, "exists": False, "count": None, "histogram": None, "witnesses": []}
+
+
+# Answer an "exists", "count" or "witnesses" query from an iterator over the colourings with an illusion, which yields
+# the rank of each such colouring together with its number of nodes under illusion, as the engines in
+# directed_no_majority_illusion.py do. The witnesses are the first colourings yielded, which are the ones with the
+# lowest ranks only for engines that yield the colourings in order. If a sink is given, the ranks of all colourings
+# that were found are passed on to it, in blocks.
+def query_illusions(illusions, mode, max_witnesses=10, sink=None):
+    result = empty_result(mode)
+    if mode == "histogram":
+        raise ValueError("A histogram needs the number of nodes under illusion of all colourings, "
+                         "see illusion_count_histogram.")
+    count = 0
+    ranks = []
+    for rank, _ in illusions:
+        count = count + 1
+        if len(result["witnesses"]) < max_witnesses:
+            result["witnesses"].append(rank)
+        if sink is not None:
+            ranks.append(rank)
+            if len(ranks) == SINK_BLOCK_SIZE:
+                sink.add(ranks)
+                ranks = []
+        if mode == "exists" or (mode == "witnesses" and count >= max_witnesses):
+            break
+    if sink is not None and ranks:
+        sink.add(ranks)
+    result["exists"] = count > 0
+    if mode == "count":
+        result["count"] = count
+    return result
+
+
+# Answer a "histogram" query from an iterator over blocks of colourings, which yields the rank of the first colouring
+# in a block together with the number of nodes under illusion for every colouring in the block, as
+# batched_illusions.iterate_majority_illusion_counts does. Function is_illusion turns an array of these numbers into
+# an array of booleans that tells which colourings have a graph-level illusion; they are counted, kept as witnesses
+# and passed on to the sink.
+def illusion_count_histogram(count_blocks, num_nodes, is_illusion, max_witnesses=10, sink=None):
+    result = empty_result("histogram")
+    histogram = np.zeros(num_nodes + 1, dtype=np.int64)
+    count = 0
+    for start, illusion_counts in count_blocks:
+        histogram += np.bincount(illusion_counts, minlength=num_nodes + 1)
+        ranks = start + np.flatnonzero(is_illusion(illusion_counts))
+        count = count + len(ranks)
+        missing = max_witnesses - len(result["witnesses"])
+        if missing > 0:
+            result["witnesses"].extend(ranks[:missing].tolist())
+        if sink is not None and len(ranks) > 0:
+            sink.add(ranks)
+    result["exists"] = count > 0
+    result["count"] = count
+    result["histogram"] = histogram.tolist()
+    return result
+
+
+# Answer a "histogram" query from a histogram that was determined without going through the colourings one by one, such
+# as the distributions of tree_decomposition_count. There are no witnesses then. The counts are Python integers, so
+# they stay exact for graphs with more than 63 nodes.
+def histogram_result(histogram, is_illusion):
+    result = empty_result("histogram")
+    illusion_counts = np.arange(len(histogram))
+    result["count"] = sum(colourings for colourings, illusion in zip(histogram, is_illusion(illusion_counts).tolist())
+                          if illusion)
+    result["exists"] = result["count"] > 0
+    result["histogram"] = list(histogram)
+    return result
+
+
+# The histogram of the fraction of nodes under illusion: for every c from 0 to n the fraction c / n together with the
+# share of all colourings that have exactly c nodes under illusion.
+def illusion_fraction_histogram(histogram):
+    num_nodes = len(histogram) - 1
+    number_of_colourings = sum(histogram)
+    return [(illusion_count / num_nodes, colourings / number_of_colourings)
+            for illusion_count, colourings in enumerate(histogram)]
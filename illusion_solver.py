@@ -0,0 +1,475 @@
+import heapq
+
+import branch_and_bound
+
+BLUE = 0
+RED = 1
+
+
+# A backtracking solver for constraints of the form a_1 * l_1 + ... + a_m * l_m >= bound over Boolean literals l_i with
+# positive coefficients a_i, and for clauses. A literal is a variable number (true) or its negation (false).
+# Assignments are propagated until nothing changes (unit propagation), and every conflict is analysed to learn a clause
+# that prevents the same conflict from happening again (conflict-driven clause learning).
+class ConstraintSolver:
+    def __init__(self):
+        self.values = [0]  # 1 if the variable is true, -1 if it is false and 0 if it is unassigned.
+        self.levels = [0]
+        self.reasons = [None]
+        self.trail_positions = [0]
+        self.activity = [0.0]
+        self.saved_phases = [-1]
+        self.trail = []
+        self.trail_limits = []
+        self.propagated = 0
+        self.clauses = []
+        self.watches = {}
+        self.constraints = []
+        self.slack = []
+        self.max_coefficients = []
+        self.occurrences = {}
+        self.activity_increase = 1.0
+        self.order_heap = []
+        self.unsatisfiable = False
+        self.conflicts = 0
+        self.learned_clauses = 0
+
+    def new_variable(self):
+        self.values.append(0)
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.trail_positions.append(0)
+        self.activity.append(0.0)
+        self.saved_phases.append(-1)
+        variable = len(self.values) - 1
+        for literal in (variable, -variable):
+            self.watches[literal] = []
+            self.occurrences[literal] = []
+        heapq.heappush(self.order_heap, (0.0, variable))
+        return variable
+
+    def value(self, literal):
+        if literal > 0:
+            return self.values[literal]
+        return -self.values[-literal]
+
+    def assign(self, literal, reason):
+        variable = abs(literal)
+        self.values[variable] = 1 if literal > 0 else -1
+        self.levels[variable] = len(self.trail_limits)
+        self.reasons[variable] = reason
+        self.trail_positions[variable] = len(self.trail)
+        self.trail.append(literal)
+        # The literal -literal is now false, which lowers the slack of every constraint it appears in.
+        for index, coefficient in self.occurrences[-literal]:
+            self.slack[index] = self.slack[index] - coefficient
+
+    # Add a clause before solving. Returns False if the problem has become unsatisfiable.
+    def add_clause(self, literals):
+        if self.unsatisfiable:
+            return False
+        literals = list(dict.fromkeys(literals))
+        if any(-literal in literals for literal in literals) or any(self.value(lit) == 1 for lit in literals):
+            return True
+        literals = [literal for literal in literals if self.value(literal) == 0]
+        if not literals:
+            self.unsatisfiable = True
+        elif len(literals) == 1:
+            self.assign(literals[0], None)
+            self.unsatisfiable = self.propagate() is not None
+        else:
+            self.attach_clause(literals)
+        return not self.unsatisfiable
+
+    def attach_clause(self, literals):
+        self.clauses.append(literals)
+        self.watches[literals[0]].append(len(self.clauses) - 1)
+        self.watches[literals[1]].append(len(self.clauses) - 1)
+        return len(self.clauses) - 1
+
+    # Add the constraint sum(coefficients[i] * literals[i]) >= bound before solving.
+    # Returns False if the problem has become unsatisfiable.
+    def add_at_least(self, literals, coefficients, bound):
+        if self.unsatisfiable:
+            return False
+        if bound <= 0:
+            return True
+        if all(coefficient == 1 for coefficient in coefficients) and bound == 1:
+            return self.add_clause(literals)
+        index = len(self.constraints)
+        self.constraints.append((list(literals), list(coefficients)))
+        self.max_coefficients.append(max(coefficients, default=0))
+        self.slack.append(sum(coefficients) - bound)
+        for literal, coefficient in zip(literals, coefficients):
+            self.occurrences[literal].append((index, coefficient))
+            if self.value(literal) == -1:
+                self.slack[index] = self.slack[index] - coefficient
+        self.unsatisfiable = self.check_constraint(index) is not None or self.propagate() is not None
+        return not self.unsatisfiable
+
+    # Detect a conflict in a constraint, or make every literal true whose coefficient is larger than the slack.
+    def check_constraint(self, index):
+        slack = self.slack[index]
+        if slack < 0:
+            return "constraint", index
+        if slack < self.max_coefficients[index]:
+            literals, coefficients = self.constraints[index]
+            for literal, coefficient in zip(literals, coefficients):
+                if coefficient > slack and self.value(literal) == 0:
+                    self.assign(literal, ("constraint", index))
+        return None
+
+    # Propagate all assignments on the trail. Returns the reason of a conflict, or None if there is no conflict.
+    def propagate(self):
+        while self.propagated < len(self.trail):
+            false_literal = -self.trail[self.propagated]
+            self.propagated = self.propagated + 1
+            for index, _ in self.occurrences[false_literal]:
+                conflict = self.check_constraint(index)
+                if conflict is not None:
+                    return conflict
+            watching = self.watches[false_literal]
+            self.watches[false_literal] = []
+            for position, clause_index in enumerate(watching):
+                clause = self.clauses[clause_index]
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.value(clause[0]) == 1:
+                    self.watches[false_literal].append(clause_index)
+                    continue
+                # Look for another literal that is not false to watch.
+                for other in range(2, len(clause)):
+                    if self.value(clause[other]) != -1:
+                        clause[1], clause[other] = clause[other], clause[1]
+                        self.watches[clause[1]].append(clause_index)
+                        break
+                else:
+                    self.watches[false_literal].append(clause_index)
+                    if self.value(clause[0]) == -1:
+                        self.watches[false_literal].extend(watching[position + 1:])
+                        return "clause", clause_index
+                    self.assign(clause[0], ("clause", clause_index))
+        return None
+
+    # The false literals that caused literal to be assigned (or all false literals of a conflict if literal is None).
+    def reason_literals(self, reason, literal):
+        kind, index = reason
+        if kind == "clause":
+            return [other for other in self.clauses[index] if other != literal]
+        literals, _ = self.constraints[index]
+        if literal is None:
+            return [other for other in literals if self.value(other) == -1]
+        position = self.trail_positions[abs(literal)]
+        return [other for other in literals if self.value(other) == -1 and self.trail_positions[abs(other)] < position]
+
+    def bump(self, variable):
+        self.activity[variable] = self.activity[variable] + self.activity_increase
+        if self.activity[variable] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.activity_increase = self.activity_increase * 1e-100
+            self.order_heap = [(-self.activity[var], var) for var in range(1, len(self.values))]
+            heapq.heapify(self.order_heap)
+        heapq.heappush(self.order_heap, (-self.activity[variable], variable))
+
+    # Derive the first unique implication point clause from a conflict. Returns the learned clause, with the literal
+    # that becomes true after backtracking first, and the level to backtrack to.
+    def analyse(self, conflict):
+        learned = [0]
+        seen = set()
+        counter = 0
+        literal = None
+        reason_literals = self.reason_literals(conflict, None)
+        index = len(self.trail) - 1
+        level = len(self.trail_limits)
+        while True:
+            for other in reason_literals:
+                variable = abs(other)
+                if variable not in seen and self.levels[variable] > 0:
+                    seen.add(variable)
+                    self.bump(variable)
+                    if self.levels[variable] == level:
+                        counter = counter + 1
+                    else:
+                        learned.append(other)
+            while abs(self.trail[index]) not in seen:
+                index = index - 1
+            literal = self.trail[index]
+            index = index - 1
+            counter = counter - 1
+            if counter == 0:
+                break
+            reason_literals = self.reason_literals(self.reasons[abs(literal)], literal)
+        learned[0] = -literal
+        backtrack_level = 0
+        if len(learned) > 1:
+            highest = max(range(1, len(learned)), key=lambda position: self.levels[abs(learned[position])])
+            learned[1], learned[highest] = learned[highest], learned[1]
+            backtrack_level = self.levels[abs(learned[1])]
+        self.activity_increase = self.activity_increase / 0.95
+        return learned, backtrack_level
+
+    def backtrack(self, level):
+        if len(self.trail_limits) <= level:
+            return
+        limit = self.trail_limits[level]
+        for literal in reversed(self.trail[limit:]):
+            variable = abs(literal)
+            self.saved_phases[variable] = self.values[variable]
+            self.values[variable] = 0
+            self.reasons[variable] = None
+            for index, coefficient in self.occurrences[-literal]:
+                self.slack[index] = self.slack[index] + coefficient
+            heapq.heappush(self.order_heap, (-self.activity[variable], variable))
+        del self.trail[limit:]
+        del self.trail_limits[level:]
+        self.propagated = len(self.trail)
+
+    def pick_branch_literal(self):
+        while self.order_heap:
+            _, variable = heapq.heappop(self.order_heap)
+            if self.values[variable] == 0:
+                return variable if self.saved_phases[variable] == 1 else -variable
+        return None
+
+    # Search for an assignment that satisfies all constraints. Returns True if there is one and False otherwise.
+    def solve(self):
+        if self.unsatisfiable or self.propagate() is not None:
+            self.unsatisfiable = True
+            return False
+        restart = 1
+        conflicts_until_restart = 100 * luby(restart)
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts = self.conflicts + 1
+                conflicts_until_restart = conflicts_until_restart - 1
+                if not self.trail_limits:
+                    self.unsatisfiable = True
+                    return False
+                learned, backtrack_level = self.analyse(conflict)
+                self.backtrack(backtrack_level)
+                self.learned_clauses = self.learned_clauses + 1
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.assign(learned[0], ("clause", self.attach_clause(learned)))
+                continue
+            if conflicts_until_restart <= 0:
+                restart = restart + 1
+                conflicts_until_restart = 100 * luby(restart)
+                self.backtrack(0)
+            literal = self.pick_branch_literal()
+            if literal is None:
+                return True
+            self.trail_limits.append(len(self.trail))
+            self.assign(literal, None)
+
+
+# The i-th element (starting at 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, ... used to schedule restarts.
+def luby(i):
+    size = 1
+    while size < i + 1:
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        if i >= size:
+            i = i - size
+    return (size + 1) // 2
+
+
+# The smallest count out of total for which count / total > fraction (or == fraction if weak is True), computed with
+# the same floating point comparisons as the checks per colouring. Returns None if there is no such count.
+def smallest_count_above(fraction, total, weak=False):
+    for count in range(total + 1):
+        if (total > 0 and count / total > fraction) or (weak and total > 0 and count / total == fraction):
+            return count
+    return None
+
+
+# The global cases that are searched separately, so that the global winners are fixed in each case. Because permuting
+# the colours does not change whether there is an illusion, the global winners are always the first colours.
+def global_cases(kind, num_nodes, num_colours, quota):
+    if kind == "majority":
+        return [("winner", RED), ("tie", None)]
+    if kind == "plurality":
+        return [("winners", num_winners) for num_winners in range(1, num_colours + 1)]
+    return [("winners", num_winners) for num_winners in range(num_colours + 1)]
+
+
+# Describe the condition for a node to be under illusion in a global case as a list of clauses. Each clause is a list
+# of alternatives and each alternative is a list of count conditions that must all hold. A count condition is a pair
+# (terms, bound) meaning sum(terms) >= bound, where a term (colour, True) counts the neighbours with that colour and a
+# term (colour, False) counts the neighbours without that colour. Returns None if the node cannot be under illusion.
+def node_illusion_condition(kind, degree, case, num_colours, weak_node, quota):
+    def at_least(colour, count):
+        return [([(colour, True)], count)]
+
+    def at_most(colour, count):
+        return [([(colour, False)], degree - count)]
+
+    def more_than(colour, other_colour, difference):
+        return [([(colour, True), (other_colour, False)], degree + difference)]
+
+    if kind == "majority":
+        if case[0] == "winner":
+            # The global winner is red, so the node needs a local blue winner (or a local tie if weak).
+            return [[at_most(RED, degree // 2 if weak_node else (degree - 1) // 2)]]
+        if not weak_node or degree == 0:
+            return None
+        if degree % 2 == 1:
+            return []
+        return [[at_most(RED, degree // 2 - 1), at_least(RED, degree // 2 + 1)]]
+    winners = range(case[1])
+    others = range(case[1], num_colours)
+    if kind == "plurality":
+        # Without neighbours there is no local plurality winner, so there is a (weak) plurality illusion.
+        if degree == 0:
+            return []
+        not_local_winner = {colour: [more_than(other, colour, 1) for other in range(num_colours) if other != colour]
+                            for colour in range(num_colours)}
+        local_winner = {colour: [condition for other in range(num_colours) if other != colour
+                                 for condition in more_than(colour, other, 0)] for colour in range(num_colours)}
+        if not weak_node:
+            return [not_local_winner[winner] for winner in winners]
+        return [[alternative for winner in winners for alternative in not_local_winner[winner]] +
+                [local_winner[other] for other in others]]
+    local_quota = smallest_count_above(quota, degree)
+    if local_quota is not None:
+        local_quota = max(local_quota, 1)
+    if not weak_node:
+        if degree == 0 or local_quota is None or case[1] == 0:
+            return None
+        return [[at_least(other, local_quota) for other in others]] + [[at_most(winner, local_quota - 1)]
+                                                                         for winner in winners]
+    if degree == 0 or local_quota is None:
+        # Without local quota winners there is a weak quota illusion if and only if there are global quota winners.
+        return [] if case[1] > 0 else None
+    return [[at_most(winner, local_quota - 1) for winner in winners] + [at_least(other, local_quota)
+                                                                         for other in others]]
+
+
+# Encode one global case for the solver. Returns the solver and the variables colour_variables[node][colour].
+def encode_case(positions, neighbours, case, kind, num_colours, needed, weak_node, quota):
+    num_nodes = len(positions)
+    solver = ConstraintSolver()
+    colour_variables = [[solver.new_variable() for _ in range(num_colours)] for _ in range(num_nodes)]
+    # Every node has exactly one colour.
+    for variables in colour_variables:
+        solver.add_clause(variables)
+        solver.add_at_least([-variable for variable in variables], [1] * num_colours, num_colours - 1)
+
+    def global_at_least(colour, count):
+        solver.add_at_least([variables[colour] for variables in colour_variables], [1] * num_nodes, count)
+
+    def global_at_most(colour, count):
+        solver.add_at_least([-variables[colour] for variables in colour_variables], [1] * num_nodes, num_nodes - count)
+
+    def global_more_than(colour, other_colour, difference):
+        literals = [variables[colour] for variables in colour_variables]
+        literals = literals + [-variables[other_colour] for variables in colour_variables]
+        solver.add_at_least(literals, [1] * len(literals), num_nodes + difference)
+
+    # Fix the global winners of this case and order the remaining colours by their counts to break symmetry.
+    if kind == "majority":
+        if case[0] == "winner":
+            global_at_least(RED, num_nodes // 2 + 1)
+        else:
+            if num_nodes % 2 == 1:
+                return None, colour_variables
+            global_at_least(RED, num_nodes // 2)
+            global_at_most(RED, num_nodes // 2)
+    else:
+        num_winners = case[1]
+        if kind == "plurality":
+            for winner in range(1, num_winners):
+                global_more_than(winner - 1, winner, 0)
+                global_more_than(winner, winner - 1, 0)
+            if num_winners < num_colours:
+                global_more_than(num_winners - 1, num_winners, 1)
+        else:
+            global_quota = smallest_count_above(quota, num_nodes)
+            if global_quota is None:
+                if num_winners > 0:
+                    return None, colour_variables
+            else:
+                for winner in range(num_winners):
+                    global_at_least(winner, max(global_quota, 1))
+                for other in range(num_winners, num_colours):
+                    global_at_most(other, global_quota - 1)
+            for winner in range(1, num_winners):
+                global_more_than(winner - 1, winner, 0)
+        for other in range(num_winners + 1, num_colours):
+            global_more_than(other - 1, other, 0)
+
+    # Every illusion variable implies that its node is under illusion, and enough illusion variables must be true.
+    illusion_variables = []
+    for position in positions:
+        condition = node_illusion_condition(kind, len(neighbours[position]), case, num_colours, weak_node, quota)
+        if condition is None:
+            continue
+        illusion_variable = solver.new_variable()
+        illusion_variables.append(illusion_variable)
+        for clause in condition:
+            alternative_variables = []
+            for alternative in clause:
+                alternative_variable = solver.new_variable()
+                alternative_variables.append(alternative_variable)
+                for terms, bound in alternative:
+                    literals = [colour_variables[neighbour][colour] if counted else
+                                -colour_variables[neighbour][colour]
+                                for colour, counted in terms for neighbour in neighbours[position]]
+                    # alternative_variable implies sum(literals) >= bound.
+                    solver.add_at_least(literals + [-alternative_variable], [1] * len(literals) + [max(bound, 0)],
+                                        bound)
+            solver.add_clause([-illusion_variable] + alternative_variables)
+    if len(illusion_variables) < needed:
+        return None, colour_variables
+    solver.add_at_least(illusion_variables, [1] * len(illusion_variables), needed)
+    return solver, colour_variables
+
+
+# A counting argument for the case in which red is the global majority winner: every node under illusion needs a number
+# of blue neighbours, and each of the at most (n - 1) // 2 blue nodes is only a neighbour of its predecessors.
+def enough_minority_neighbours(neighbours, needed, weak_node):
+    in_degrees = [0] * len(neighbours)
+    for node_neighbours in neighbours:
+        for neighbour in node_neighbours:
+            in_degrees[neighbour] = in_degrees[neighbour] + 1
+    max_blue_nodes = len(neighbours) - (len(neighbours) // 2 + 1)
+    supply = sum(sorted(in_degrees, reverse=True)[:max_blue_nodes])
+    blue_neighbours_needed = [branch_and_bound.minority_neighbours_needed(len(node_neighbours), weak_node)
+                              for node_neighbours in neighbours]
+    return branch_and_bound.minority_supply_bound(blue_neighbours_needed, supply) >= needed
+
+
+# Decide whether some colouring of the graph leads to an illusion in which at least a 1/k fraction of the nodes is under
+# (weak-)illusion, without going through all colourings. kind is "majority" (two colours, k = 2 gives a
+# majority-(weak)-majority illusion), "plurality" or "quota". weak_node and weak_global determine whether weak
+# illusions per node and a fraction of exactly 1/k count. Returns whether such a colouring exists, a witness colouring
+# (or None) and, for every global case that was ruled out, the argument that ruled it out. If no colouring exists,
+# these cases together cover every possible colouring, which proves that there is no such illusion.
+def solve_illusion_existence(graph, kind, k, colours, weak_node=True, weak_global=False, quota=None,
+                             label_offset=0):
+    positions = [node - label_offset for node in graph.nodes()]
+    neighbours = [[] for _ in positions]
+    for node in graph.nodes():
+        neighbours[node - label_offset] = [neighbour - label_offset for neighbour in graph.neighbors(node)]
+    needed = smallest_count_above(1 / k, len(positions), weak_global)
+    refutation = []
+    if needed is None:
+        return False, None, refutation
+    for case in global_cases(kind, len(positions), len(colours), quota):
+        if kind == "majority" and case[0] == "winner" and not enough_minority_neighbours(neighbours, needed, weak_node):
+            refutation.append((case, "too few blue nodes to give enough nodes a local blue (or tied) majority"))
+            continue
+        solver, colour_variables = encode_case(positions, neighbours, case, kind, len(colours), needed, weak_node,
+                                               quota)
+        if solver is None:
+            refutation.append((case, "no colouring has these global winners and enough nodes that can be under "
+                                     "illusion"))
+            continue
+        if solver.solve():
+            witness = [colours[[solver.value(variable) for variable in variables].index(1)]
+                       for variables in colour_variables]
+            return True, witness, refutation
+        refutation.append((case, "ruled out by the solver after " + str(solver.conflicts) + " conflicts"))
+    return False, None, refutation
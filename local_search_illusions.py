@@ -0,0 +1,214 @@
+import math
+
+import numpy as np
+
+import batched_illusions
+import colour_codes
+import csr_graph
+import monte_carlo_illusions
+from batched_illusions import RED
+from gray_code_search import local_majority_winner, number_of_illusions
+
+# The local search methods: simulated annealing flips a random node to a random colour and keeps the change with the
+# Metropolis rule, tabu search samples a few flips of nodes that have not been flipped recently and makes the best one.
+METHODS = ("annealing", "tabu")
+
+
+# The state of a local search over the colourings of a graph: the colouring, the number of neighbours with each colour
+# of every node, the number of nodes with each colour and the local winners of every node, kept up to date while single
+# nodes are flipped. The number of nodes with each local winner is kept as well, so the number of nodes under illusion
+# follows from it and the global winners without looking at the nodes. Flipping a node only changes the neighbour
+# counts and local winners of the nodes that have it as a neighbour, so a flip costs O(in-degree) for a fixed number of
+# colours. Multiple edges count as often as they appear, as in colour_codes.neighbour_colour_counts.
+# For "majority" the local winners are BLUE, RED or TIE; for "plurality" and "quota" they are bitmasks as in
+# colour_codes. The nodes under illusion are those of illusion_profile.illusion_nodes, strict or weak.
+class IllusionLocalSearch:
+    def __init__(self, graph, kind, num_colours, colouring, weak=False, quota=None):
+        self.kind = kind
+        self.num_colours = num_colours
+        self.weak = weak
+        self.quota = quota
+        self.num_nodes = len(graph.nodes)
+        sources = np.repeat(np.arange(self.num_nodes), np.diff(graph.offsets))
+        targets = graph.targets - graph.label_offset
+        order = np.argsort(targets, kind="stable")
+        in_offsets = np.searchsorted(targets[order], np.arange(self.num_nodes + 1))
+        in_sources = sources[order].tolist()
+        self.predecessors = [in_sources[in_offsets[position]:in_offsets[position + 1]]
+                             for position in range(self.num_nodes)]
+        self.colouring = colouring.tolist()
+        neighbour_counts = colour_codes.neighbour_colour_counts(graph, colouring, num_colours, graph.label_offset)
+        self.neighbour_counts = neighbour_counts.tolist()
+        self.global_counts = colour_codes.colour_counts(colouring, num_colours).tolist()
+        if kind == "majority":
+            local_winners = batched_illusions.majority_winners(neighbour_counts[:, RED], neighbour_counts.sum(axis=1))
+            self.winner = majority_winner
+            self.winner_counts = [0] * 3
+        elif kind == "plurality":
+            local_winners = colour_codes.plurality_winner_masks(neighbour_counts)
+            self.winner = plurality_winner_mask
+            self.winner_counts = [0] * 2 ** num_colours
+        else:
+            local_winners = colour_codes.quota_winner_masks(neighbour_counts, quota)
+            self.winner = lambda counts: quota_winner_mask(counts, quota)
+            self.winner_counts = [0] * 2 ** num_colours
+        # The local winners of the neighbour colour counts seen so far. Nodes have few neighbours, so few different
+        # counts occur and looking them up is much faster than determining the winners again.
+        self.local_winner_cache = {}
+        self.local_winners = local_winners.tolist()
+        for local_winner in self.local_winners:
+            self.winner_counts[local_winner] = self.winner_counts[local_winner] + 1
+
+    # The number of nodes under illusion in the current colouring.
+    def illusion_count(self):
+        global_winner = self.winner(self.global_counts)
+        if self.kind == "majority":
+            return number_of_illusions(self.winner_counts, global_winner, self.num_nodes, self.weak)
+        if self.weak:
+            return self.num_nodes - self.winner_counts[global_winner]
+        if self.kind == "quota" and global_winner == 0:
+            return 0
+        # A quota illusion needs local quota winners; without neighbours there is no plurality winner either.
+        first_mask = 1 if self.kind == "quota" else 0
+        return sum(self.winner_counts[mask] for mask in range(first_mask, len(self.winner_counts))
+                   if mask & global_winner == 0)
+
+    # Give a node another colour and update the counts of the nodes that have it as a neighbour.
+    def flip(self, node, colour):
+        old_colour = self.colouring[node]
+        self.colouring[node] = colour
+        self.global_counts[old_colour] = self.global_counts[old_colour] - 1
+        self.global_counts[colour] = self.global_counts[colour] + 1
+        cache = self.local_winner_cache
+        for predecessor in self.predecessors[node]:
+            counts = self.neighbour_counts[predecessor]
+            counts[old_colour] = counts[old_colour] - 1
+            counts[colour] = counts[colour] + 1
+            key = tuple(counts)
+            new_winner = cache.get(key)
+            if new_winner is None:
+                new_winner = self.winner(counts)
+                cache[key] = new_winner
+            old_winner = self.local_winners[predecessor]
+            if new_winner != old_winner:
+                self.winner_counts[old_winner] = self.winner_counts[old_winner] - 1
+                self.winner_counts[new_winner] = self.winner_counts[new_winner] + 1
+                self.local_winners[predecessor] = new_winner
+
+    # The number of nodes under illusion if a node had another colour. The colouring is left as it was.
+    def illusion_count_after_flip(self, node, colour):
+        old_colour = self.colouring[node]
+        self.flip(node, colour)
+        illusion_count = self.illusion_count()
+        self.flip(node, old_colour)
+        return illusion_count
+
+
+# The winners of a single node or of the whole graph from its colour counts, the same as in batched_illusions and
+# colour_codes but without arrays, as the local search updates one node at a time.
+def majority_winner(counts):
+    return local_majority_winner(counts[RED], sum(counts))
+
+
+def plurality_winner_mask(counts):
+    highest = max(counts)
+    if highest == 0:
+        return 0
+    return sum(1 << colour for colour, count in enumerate(counts) if count == highest)
+
+
+def quota_winner_mask(counts, quota):
+    total = sum(counts)
+    return sum(1 << colour for colour, count in enumerate(counts) if count > 0 and count / total > quota)
+
+
+# A random colour other than the current colour of a node.
+def other_colour(rng, colour, num_colours):
+    return (colour + 1 + int(rng.integers(num_colours - 1))) % num_colours
+
+
+# Run one local search from a random colouring for the given number of steps. Returns the best colouring found, its
+# number of nodes under illusion and a trace with the step, the current and the best number of nodes under illusion,
+# taken trace_points times during the search.
+def local_search_run(search, rng, method, steps, initial_temperature, final_temperature, tabu_tenure, candidates,
+                     trace_points):
+    current = search.illusion_count()
+    best = current
+    # The flips made since the best colouring, so the best colouring can be restored at the end without copying the
+    # colouring every time it improves.
+    flips_since_best = []
+    tabu_until = [0] * search.num_nodes
+    trace = [(0, current, best)]
+    trace_interval = max(1, steps // trace_points)
+    for step in range(1, steps + 1):
+        if method == "annealing":
+            node = int(rng.integers(search.num_nodes))
+            colour = other_colour(rng, search.colouring[node], search.num_colours)
+            new = search.illusion_count_after_flip(node, colour)
+            temperature = initial_temperature * (final_temperature / initial_temperature) ** (step / steps)
+            if new < current and rng.random() >= math.exp((new - current) / temperature):
+                node = None
+        else:
+            node = None
+            for candidate in rng.integers(search.num_nodes, size=candidates).tolist():
+                candidate_colour = other_colour(rng, search.colouring[candidate], search.num_colours)
+                candidate_new = search.illusion_count_after_flip(candidate, candidate_colour)
+                # A tabu node may still be flipped if that gives a new best colouring.
+                if tabu_until[candidate] > step and candidate_new <= best:
+                    continue
+                if node is None or candidate_new > new:
+                    node, colour, new = candidate, candidate_colour, candidate_new
+            if node is not None:
+                tabu_until[node] = step + tabu_tenure
+        if node is not None:
+            flips_since_best.append((node, search.colouring[node]))
+            search.flip(node, colour)
+            current = new
+            if current > best:
+                best = current
+                flips_since_best = []
+        if step % trace_interval == 0:
+            trace.append((step, current, best))
+    for node, colour in reversed(flips_since_best):
+        search.flip(node, colour)
+    return np.array(search.colouring, dtype=np.uint8), best, trace
+
+
+# Search for a colouring of a graph that puts as large a fraction of the nodes as possible under (weak) illusion of the
+# given kind, for graphs that are too large to check every colouring. Every restart starts from a uniformly random
+# colouring and makes steps single-node flips, by default a few per node, which takes seconds for 10^5 nodes. Restart r
+# uses a generator seeded with (seed, r), so every restart can be repeated on its own; if no seed is given a random one
+# is chosen and returned.
+# Returns a dictionary with the best integer-coded colouring over all restarts, its fraction of nodes under illusion,
+# the best fraction of every restart and the trace of every restart (see local_search_run).
+def search_illusion_colouring(graph, kind, colours, weak=False, quota=None, method="annealing", steps=None, restarts=1,
+                              seed=None, initial_temperature=1.0, final_temperature=0.01, tabu_tenure=None,
+                              candidates=8, trace_points=100):
+    if method not in METHODS:
+        raise ValueError("Unknown method: " + str(method) + ". Choose from " + ", ".join(METHODS) + ".")
+    if not isinstance(graph, csr_graph.CSRGraph):
+        graph = csr_graph.CSRGraph(graph)
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy)
+    num_nodes = len(graph.nodes)
+    # Tabu search tries candidates flips per step, so it makes fewer steps by default.
+    if steps is None:
+        steps = 2 * num_nodes if method == "annealing" else max(1, 4 * num_nodes // candidates)
+    if tabu_tenure is None:
+        tabu_tenure = max(1, min(num_nodes // 4, 20))
+    best_colouring = None
+    best = -1
+    restart_fractions = []
+    traces = []
+    for restart in range(restarts):
+        rng = np.random.default_rng([seed, restart])
+        colouring = monte_carlo_illusions.sample_colourings(rng, 1, num_nodes, len(colours))[0]
+        search = IllusionLocalSearch(graph, kind, len(colours), colouring, weak, quota)
+        colouring, illusion_count, trace = local_search_run(search, rng, method, steps, initial_temperature,
+                                                            final_temperature, tabu_tenure, candidates, trace_points)
+        restart_fractions.append(illusion_count / num_nodes)
+        traces.append(trace)
+        if illusion_count > best:
+            best_colouring, best = colouring, illusion_count
+    return {"colouring": best_colouring, "fraction": best / num_nodes, "seed": seed,
+            "restart_fractions": restart_fractions, "traces": traces}
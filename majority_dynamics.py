@@ -0,0 +1,241 @@
+import heapq
+import time
+
+import numpy as np
+
+import batched_illusions
+import colour_codes
+import csr_graph
+from batched_illusions import RED, TIE
+from gray_code_search import local_majority_winner, number_of_illusions
+
+# The ways in which a simulation of the majority dynamics can end.
+OUTCOMES = ("fixed_point", "two_cycle", "step_cap")
+# The orders in which the nodes can be updated: all at once, or one at a time in a random order or in the order of their
+# labels, where a node that is updated sees the colours that the nodes before it got in the same sweep.
+SCHEDULES = ("synchronous", "random_sequential", "fixed_order")
+
+
+# The colourings of majority dynamics on a graph: in every step all nodes at once take the colour of the majority of
+# their neighbours, and keep their colour if there is a tie (which includes having no neighbours). The graph is stored
+# as the source and target position of every edge, so a step is one sparse matrix-vector product done with a bincount
+# over the edges. This takes O(n + m) memory, so graphs with 10^6 nodes fit easily. Node positions are the labels minus
+# the label_offset of the csr_graph.CSRGraph, which is 1 for the graphs of dynamic_illusions.py.
+class MajorityDynamics:
+    def __init__(self, graph):
+        self.num_nodes = len(graph.nodes)
+        self.degrees = np.diff(graph.offsets)
+        self.sources = np.repeat(np.arange(self.num_nodes, dtype=np.int32), self.degrees)
+        self.targets = graph.targets - np.int32(graph.label_offset)
+
+    # The number of red neighbours of every node.
+    def red_neighbour_counts(self, colouring):
+        return np.bincount(self.sources, weights=colouring[self.targets], minlength=self.num_nodes).astype(np.int64)
+
+    # One synchronous step. Returns the new colouring and the local majority winners of the old colouring.
+    def step(self, colouring):
+        local_winners = batched_illusions.majority_winners(self.red_neighbour_counts(colouring), self.degrees)
+        new_colouring = np.where(local_winners == TIE, colouring, local_winners).astype(np.uint8)
+        return new_colouring, local_winners
+
+
+# Summary statistics of a colouring reached by the dynamics: the number of red nodes, the number of nodes that changed
+# colour in the step that led to it and the number of nodes under (strict) majority illusion.
+def step_statistics(step, colouring, changed, local_winners):
+    num_red = int(np.count_nonzero(colouring))
+    global_winner = batched_illusions.majority_winners(num_red, len(colouring))
+    illusion = (local_winners != global_winner) & (local_winners != TIE) & (global_winner != TIE)
+    illusions = int(np.count_nonzero(illusion))
+    return {"step": step, "red": num_red, "changed": changed, "illusions": illusions,
+            "majority_majority_illusion": 2 * illusions > len(colouring)}
+
+
+def print_step_statistics(statistics):
+    print("step", statistics["step"], "red", statistics["red"], "changed", statistics["changed"], "under illusion",
+          statistics["illusions"])
+
+
+# Run the majority dynamics from a colouring until it reaches a fixed point or a cycle of period 2 (synchronous majority
+# dynamics on an undirected graph always ends in one of these), or until max_steps steps have been made. The colouring
+# can be given by colour names ("blue" and "red") or integer-coded. Instead of the colourings, summary statistics of
+# every colouring that is reached (see step_statistics) are passed to on_step, for example print_step_statistics.
+# Returns a dictionary with the outcome (see OUTCOMES), the number of steps made, the convergence time (the first step
+# whose colouring is on the fixed point or cycle), the final integer-coded colouring and the time taken.
+def run_majority_dynamics(graph, colouring, max_steps=1000, on_step=None, label_offset=None):
+    start_time = time.perf_counter()
+    if not isinstance(graph, csr_graph.CSRGraph):
+        graph = csr_graph.CSRGraph(graph, label_offset)
+    dynamics = MajorityDynamics(graph)
+    current = colour_codes.encode_colouring(colouring, ["blue", "red"]).astype(np.uint8)
+    previous = None
+    outcome = "step_cap"
+    convergence_time = None
+    step = 0
+    changed = 0
+    while True:
+        new, local_winners = dynamics.step(current)
+        if on_step is not None:
+            on_step(step_statistics(step, current, changed, local_winners))
+        changed = int(np.count_nonzero(new != current))
+        if changed == 0:
+            outcome, convergence_time = "fixed_point", step
+            break
+        if previous is not None and np.array_equal(new, previous):
+            outcome, convergence_time = "two_cycle", step - 1
+            break
+        if step == max_steps:
+            break
+        previous, current = current, new
+        step = step + 1
+    return {"outcome": outcome, "steps": step, "convergence_time": convergence_time, "colouring": current,
+            "seconds": time.perf_counter() - start_time}
+
+
+# Majority dynamics that only look at the frontier: the nodes whose number of red neighbours changed in the last step.
+# The number of red neighbours and the local winner of every node are kept up to date, so a node outside the frontier
+# already has its final colour for the current step. A step costs time proportional to the frontier and the in-degrees
+# of the nodes that change colour instead of O(n + m), which makes long runs on nearly converged graphs cheap. The
+# number of red nodes and the number of nodes with each local winner are kept as well, for the statistics of a step.
+class FrontierMajorityDynamics:
+    def __init__(self, graph, colouring):
+        self.num_nodes = len(graph.nodes)
+        self.degrees = np.diff(graph.offsets)
+        sources = np.repeat(np.arange(self.num_nodes, dtype=np.int32), self.degrees)
+        targets = graph.targets - np.int32(graph.label_offset)
+        # The nodes that have a node as a neighbour, in compressed sparse row form.
+        order = np.argsort(targets, kind="stable")
+        self.in_offsets = np.searchsorted(targets[order], np.arange(self.num_nodes + 1))
+        self.in_sources = sources[order]
+        self.colouring = colouring.copy()
+        self.red_counts = np.bincount(sources, weights=colouring[targets], minlength=self.num_nodes).astype(np.int64)
+        self.local_winners = batched_illusions.majority_winners(self.red_counts, self.degrees)
+        self.winner_counts = np.bincount(self.local_winners, minlength=3).tolist()
+        self.num_red = int(np.count_nonzero(colouring))
+        # At the start every node may have to change colour.
+        self.frontier = np.arange(self.num_nodes)
+
+    # Flip the colours of the given nodes (each at most once) and update the number of red neighbours and the local
+    # winners of the nodes that have them as neighbours. These nodes become the frontier.
+    def flip_nodes(self, nodes):
+        self.colouring[nodes] ^= 1
+        changes = np.where(self.colouring[nodes] == RED, 1, -1)
+        self.num_red = self.num_red + int(changes.sum())
+        lengths = self.in_offsets[nodes + 1] - self.in_offsets[nodes]
+        first_positions = np.repeat(self.in_offsets[nodes] - np.cumsum(lengths) + lengths, lengths)
+        predecessors = self.in_sources[first_positions + np.arange(int(lengths.sum()))]
+        touched, touched_index = np.unique(predecessors, return_inverse=True)
+        self.red_counts[touched] += np.bincount(touched_index, weights=np.repeat(changes, lengths),
+                                                minlength=len(touched)).astype(np.int64)
+        old_winners = self.local_winners[touched]
+        new_winners = batched_illusions.majority_winners(self.red_counts[touched], self.degrees[touched])
+        self.local_winners[touched] = new_winners
+        for winner, count in enumerate(np.bincount(new_winners, minlength=3) - np.bincount(old_winners, minlength=3)):
+            self.winner_counts[winner] = self.winner_counts[winner] + int(count)
+        self.frontier = touched
+
+    # One synchronous step: every node of the frontier takes its local winner unless that is a tie. Returns the sorted
+    # positions of the nodes that changed colour.
+    def synchronous_step(self):
+        winners = self.local_winners[self.frontier]
+        changed = self.frontier[(winners != TIE) & (winners != self.colouring[self.frontier])]
+        self.flip_nodes(changed)
+        return changed
+
+    # One asynchronous sweep over the nodes, in the order of their labels or, if a random number generator is given, in
+    # a new random order. Only nodes in the frontier or whose neighbours change colour earlier in the sweep can change,
+    # so only those are put in the order: a node gets its key (its position or a random number) when it is first
+    # reached, and if that key comes before the node that is being updated, the node comes in the next sweep. Returns
+    # the positions of the nodes that changed colour.
+    def asynchronous_sweep(self, rng=None):
+        keys = {}
+        for node in self.frontier.tolist():
+            keys[node] = float(rng.random()) if rng is not None else node
+        heap = [(key, node) for node, key in keys.items()]
+        heapq.heapify(heap)
+        updated = set()
+        next_frontier = set()
+        changed = []
+        while heap:
+            key, node = heapq.heappop(heap)
+            updated.add(node)
+            winner = int(self.local_winners[node])
+            if winner == TIE or winner == self.colouring[node]:
+                continue
+            self.colouring[node] = winner
+            change = 1 if winner == RED else -1
+            self.num_red = self.num_red + change
+            changed.append(node)
+            for predecessor in self.in_sources[self.in_offsets[node]:self.in_offsets[node + 1]].tolist():
+                self.red_counts[predecessor] = self.red_counts[predecessor] + change
+                old_winner = int(self.local_winners[predecessor])
+                new_winner = local_majority_winner(int(self.red_counts[predecessor]), int(self.degrees[predecessor]))
+                if new_winner != old_winner:
+                    self.local_winners[predecessor] = new_winner
+                    self.winner_counts[old_winner] = self.winner_counts[old_winner] - 1
+                    self.winner_counts[new_winner] = self.winner_counts[new_winner] + 1
+                if predecessor in updated:
+                    next_frontier.add(predecessor)
+                elif predecessor not in keys:
+                    keys[predecessor] = float(rng.random()) if rng is not None else predecessor
+                    if keys[predecessor] > key:
+                        heapq.heappush(heap, (keys[predecessor], predecessor))
+                    else:
+                        next_frontier.add(predecessor)
+        self.frontier = np.array(sorted(next_frontier), dtype=np.int64)
+        return np.array(sorted(changed), dtype=np.int64)
+
+    # The statistics of step_statistics, from the kept counts instead of the whole colouring.
+    def statistics(self, step, changed):
+        global_winner = local_majority_winner(self.num_red, self.num_nodes)
+        illusions = number_of_illusions(self.winner_counts, global_winner, self.num_nodes, False)
+        return {"step": step, "red": self.num_red, "changed": changed, "illusions": illusions,
+                "majority_majority_illusion": 2 * illusions > self.num_nodes, "frontier": len(self.frontier)}
+
+
+# Run the majority dynamics from a colouring with the given schedule (see SCHEDULES), updating only the frontier (see
+# FrontierMajorityDynamics), until the colouring no longer changes, until it alternates between two colourings (which
+# only happens with the synchronous schedule) or until max_steps steps or sweeps have been made. The random order of
+# every sweep of the "random_sequential" schedule is drawn from a generator seeded with seed, so a run can be repeated;
+# if no seed is given a random one is chosen. The statistics of every step are passed to on_step, with the size of the
+# frontier added. The result is that of run_majority_dynamics with the seed added; with the synchronous schedule the
+# runs are identical.
+def run_frontier_majority_dynamics(graph, colouring, schedule="synchronous", max_steps=1000, on_step=None, seed=None,
+                                   label_offset=None):
+    if schedule not in SCHEDULES:
+        raise ValueError("Unknown schedule: " + str(schedule) + ". Choose from " + ", ".join(SCHEDULES) + ".")
+    start_time = time.perf_counter()
+    if not isinstance(graph, csr_graph.CSRGraph):
+        graph = csr_graph.CSRGraph(graph, label_offset)
+    colouring = colour_codes.encode_colouring(colouring, ["blue", "red"]).astype(np.uint8)
+    dynamics = FrontierMajorityDynamics(graph, colouring)
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy)
+    rng = np.random.default_rng(seed) if schedule == "random_sequential" else None
+    previous_changed = None
+    outcome = "step_cap"
+    convergence_time = None
+    step = 0
+    changed = np.zeros(0, dtype=np.int64)
+    while True:
+        if on_step is not None:
+            on_step(dynamics.statistics(step, len(changed)))
+        if schedule == "synchronous":
+            changed = dynamics.synchronous_step()
+        else:
+            changed = dynamics.asynchronous_sweep(rng)
+        if len(changed) == 0:
+            outcome, convergence_time = "fixed_point", step
+            break
+        # Every node has two colours, so the colouring returns to that of the step before exactly when the same nodes
+        # change colour twice in a row.
+        if schedule == "synchronous" and previous_changed is not None and np.array_equal(changed, previous_changed):
+            outcome, convergence_time = "two_cycle", step - 1
+            dynamics.flip_nodes(changed)
+            break
+        if step == max_steps:
+            dynamics.flip_nodes(changed)
+            break
+        previous_changed = changed
+        step = step + 1
+    return {"outcome": outcome, "steps": step, "convergence_time": convergence_time, "colouring": dynamics.colouring,
+            "seed": seed, "seconds": time.perf_counter() - start_time}
@@ -0,0 +1,146 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+import csr_graph
+import illusion_profile
+
+# The confidence intervals that can be used for the estimated probabilities.
+INTERVALS = ("wilson", "clopper_pearson")
+# Number of array entries (colourings times edges) that one batch of sampled colourings may take, and the largest
+# number of colourings in a batch, so sampling on small graphs still stops soon after the precision is reached.
+BATCH_ENTRIES = 2 ** 22
+MAX_BATCH_SIZE = 2 ** 12
+
+
+# Draw a batch of integer-coded colourings of num_nodes nodes, one colouring per row. If num_red is None, every node
+# gets one of the num_colours colours uniformly at random. Otherwise the colourings are two-colourings in which exactly
+# num_red nodes are red, chosen uniformly at random: the nodes with the num_red smallest random keys.
+def sample_colourings(rng, num_colourings, num_nodes, num_colours, num_red=None):
+    if num_red is None:
+        return rng.integers(0, num_colours, size=(num_colourings, num_nodes), dtype=np.uint8)
+    if num_red == 0:
+        return np.zeros((num_colourings, num_nodes), dtype=np.uint8)
+    keys = rng.random((num_colourings, num_nodes))
+    thresholds = np.partition(keys, num_red - 1, axis=1)[:, num_red - 1:num_red]
+    return (keys <= thresholds).astype(np.uint8)
+
+
+# The continued fraction of the incomplete beta function, evaluated with the modified Lentz method.
+def incomplete_beta_fraction(x, a, b):
+    tiny = 1e-300
+    c = 1.0
+    d = 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    fraction = d
+    for m in range(1, 100000):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            fraction = fraction * c * d
+        if abs(c * d - 1) < 1e-15:
+            break
+    return fraction
+
+
+# The regularised incomplete beta function I_x(a, b), which is the cumulative distribution function of the beta
+# distribution with parameters a and b.
+def regularised_incomplete_beta(x, a, b):
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    # The continued fraction converges quickly on this side of the mean; the other side follows from symmetry.
+    if x < (a + 1) / (a + b + 2):
+        return math.exp(log_front) * incomplete_beta_fraction(x, a, b) / a
+    return 1 - math.exp(log_front) * incomplete_beta_fraction(1 - x, b, a) / b
+
+
+# The p-quantile of the beta distribution with parameters a and b, found by bisection.
+def beta_quantile(p, a, b):
+    low = 0.0
+    high = 1.0
+    for _ in range(60):
+        middle = (low + high) / 2
+        if regularised_incomplete_beta(middle, a, b) < p:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+# The Wilson score interval for a probability that was observed successes times in samples draws.
+def wilson_interval(successes, samples, confidence):
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    estimate = successes / samples
+    centre = (estimate + z * z / (2 * samples)) / (1 + z * z / samples)
+    half_width = (z / (1 + z * z / samples)) * math.sqrt(estimate * (1 - estimate) / samples
+                                                          + z * z / (4 * samples * samples))
+    return max(0.0, centre - half_width), min(1.0, centre + half_width)
+
+
+# The exact Clopper-Pearson interval for a probability that was observed successes times in samples draws.
+def clopper_pearson_interval(successes, samples, confidence):
+    alpha = 1 - confidence
+    low = 0.0 if successes == 0 else beta_quantile(alpha / 2, successes, samples - successes + 1)
+    high = 1.0 if successes == samples else beta_quantile(1 - alpha / 2, successes + 1, samples - successes)
+    return low, high
+
+
+def confidence_interval(successes, samples, confidence, interval):
+    if interval == "wilson":
+        return wilson_interval(successes, samples, confidence)
+    return clopper_pearson_interval(successes, samples, confidence)
+
+
+# Estimate the probability that a random colouring of a graph leads to each of the four variants of a graph-level
+# illusion of the given kind (see illusion_profile), for graphs that are too large to check every colouring. The
+# colourings are drawn in batches and checked with sparse neighbour counts, so graphs with 10^4 to 10^6 nodes can be
+# handled. They are drawn uniformly, or with exactly num_red red nodes for two colours. Sampling stops once the
+# confidence intervals of all four variants are at most 2 * precision wide, or after max_samples colourings.
+# Batch b is drawn from a generator seeded with (seed, b), so a run with the same seed and batch size gives the same
+# result; if no seed is given a random one is chosen and returned.
+# Returns a dictionary with the number of samples and, for every variant in the order of illusion_profile, the number of
+# colourings with an illusion, the estimated probability and its confidence interval.
+def estimate_illusion_probabilities(graph, kind, k, colours, quota=None, num_red=None, precision=0.01,
+                                    confidence=0.95, interval="wilson", seed=None, max_samples=10 ** 6,
+                                    batch_size=None):
+    if interval not in INTERVALS:
+        raise ValueError("Unknown interval: " + str(interval) + ". Choose from " + ", ".join(INTERVALS) + ".")
+    if num_red is not None and len(colours) != 2:
+        raise ValueError("A fixed number of red nodes needs two colours.")
+    if not isinstance(graph, csr_graph.CSRGraph):
+        graph = csr_graph.CSRGraph(graph)
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy)
+    num_nodes = len(graph.nodes)
+    if batch_size is None:
+        entries_per_colouring = max(len(graph.targets), num_nodes * len(colours), 1)
+        batch_size = max(1, min(MAX_BATCH_SIZE, BATCH_ENTRIES // entries_per_colouring))
+    illusions = np.zeros(4, dtype=np.int64)
+    samples = 0
+    batch_index = 0
+    next_check = 0
+    while True:
+        rng = np.random.default_rng([seed, batch_index])
+        colourings = sample_colourings(rng, min(batch_size, max_samples - samples), num_nodes, len(colours), num_red)
+        profiles = illusion_profile.batch_illusion_profiles(graph, colourings, kind, k, len(colours), quota)
+        illusions += profiles.sum(axis=0)
+        samples = samples + len(colourings)
+        batch_index = batch_index + 1
+        # The intervals are only determined each time the number of samples has grown by a sixteenth, so even with
+        # batches of a single colouring the intervals cost little.
+        if samples >= next_check or samples >= max_samples:
+            intervals = [confidence_interval(int(successes), samples, confidence, interval) for successes in illusions]
+            precision_reached = max(high - low for low, high in intervals) <= 2 * precision
+            if precision_reached or samples >= max_samples:
+                break
+            next_check = samples + max(1, samples // 16)
+    return {"kind": kind, "k": k, "samples": samples, "seed": seed, "confidence": confidence, "interval": interval,
+            "precision_reached": precision_reached, "illusions": illusions.tolist(),
+            "estimates": (illusions / samples).tolist(), "intervals": intervals}
@@ -1,57 +1,38 @@
+import argparse
+import itertools
+import os
+
 import networkx as nx
+import numpy as np
 import matplotlib.pyplot as plt
 from collections import Counter
-import random
+
+import batched_illusions
+import colour_codes
+import colour_options
+import counter_example_search
+import csr_graph
+import illusion_profile
+import illusion_solver
+import parallel_search
+import random_digraphs
+import search_telemetry
+import sweep_checkpoint
+import symmetry_reduction
+
+COLOURS = ["blue", "red", "yellow", "green"]
 
 
 # Create a random directed graph using a specified number of nodes.
 def create_random_directed_graph(nodes, seed_number):
-    graph = nx.random_k_out_graph(nodes, 4, alpha=0.5, self_loops=False, seed=seed_number)
-    temp_graph = graph.copy()
-    for node in graph.nodes():
-        neighbours = list(graph.neighbors(node))
-        temp_graph = graph.copy()
-        # Make sure the digraph does not contain multiple edges between 2 nodes
-        for neighbour in neighbours:
-            counter = 0
-            for edge in temp_graph.edges():  # Loop over the edges
-                if edge == (node, neighbour):  # Count how many times the current (node,neighbour) edge appears
-                    counter = counter + 1
-            while counter > 1:  # While there is more than 1 of the same (node, neighbour) edge, remove the edge
-                temp_graph.remove_edges_from([(node, neighbour)])
-                counter = counter - 1
-        if node in neighbours:  # Remove self-loops
-            temp_graph.remove_edges_from([(node, node)])
-            neighbours.remove(node)
-        graph = temp_graph.copy()
-        if not neighbours:  # Ensure every node has a neighbour
-            temp_graph = graph.copy()
-            random_node = random.randint(0, len(graph.nodes()))
-            if random_node != node:
-                temp_graph.add_edge(node, random_node)
-    graph = temp_graph.copy()
-    # nx.draw(graph)
-    # plt.show()
-    return graph
-
-
-# Create all possible ways to colour a graph using four colours
+    # Every node gets 4 random neighbours among the other nodes, where a neighbour drawn twice becomes one edge, so the
+    # digraph has no self-loops or multiple edges and every node has a neighbour.
+    return random_digraphs.create_random_k_out_digraph(nodes, 4, seed_number)
+
+
+# Lazily iterate over all possible ways to colour a graph using four colours
 def all_colour_options_graph(graph):
-    colour_list = [[]]
-    # Loop over the nodes
-    for node in range(len(graph.nodes)):
-        temp_colours = []
-        # Loop over the colour lists so far
-        for item in colour_list:
-            # Add each of the 4 colours to all the colour lists so far
-            for colour in ["blue", "red", "yellow", "green"]:
-                temp_colour_list = item.copy()
-                temp_colour_list.append(colour)
-                temp_colours.append(temp_colour_list)
-        # Update the colour lists so far using the temporary list
-        colour_list = temp_colours
-        # print(temp_colours)
-    return colour_list
+    return colour_options.iterate_colour_options(graph, COLOURS)
 
 
 # Change the position of node labels in the plot
@@ -61,6 +42,8 @@ def nudge(pos, x_shift, y_shift):
 
 # Plot the graph
 def plot_graph(graph, colour_map):
+    graph = csr_graph.as_networkx(graph)
+    colour_map = colour_codes.decode_colouring(colour_map, COLOURS)
     fig, ax = plt.subplots(1, 1, figsize=(12, 6))
     pos = nx.spring_layout(graph)
     nx.draw_networkx(graph, with_labels=False, pos=pos, ax=ax, node_color=colour_map, arrowsize=20)  # default labeling
@@ -91,11 +74,24 @@ def most_frequent(agent_colours):
     return list_frequent_colours
 
 
+# Determine the global plurality winners of a colouring given by colour names or integer-coded (see colour_codes). For
+# an integer-coded colouring the winners are a bitmask.
+def global_plurality_winners(colouring):
+    if isinstance(colouring, np.ndarray):
+        return int(colour_codes.plurality_winner_masks(colour_codes.colour_counts(colouring, len(COLOURS))))
+    return most_frequent(colouring)
+
+
 # Check for a given node, graph and colouring whether there is a plurality illusion for that node.
-def check_plurality_illusion_node(graph, node, colouring):
+# The global plurality winners are the same for every node, so they can be given if they have already been determined.
+# The colouring can be given by colour names or integer-coded (see colour_codes).
+def check_plurality_illusion_node(graph, node, colouring, plurality_winner_global=None):
+    if isinstance(colouring, np.ndarray):
+        return check_plurality_illusion_node_codes(graph, node, colouring, plurality_winner_global)
     # Determine the global opinion
-    plurality_winner_global = most_frequent(colouring)
-    neighbours = list(graph.neighbors(node))
+    if plurality_winner_global is None:
+        plurality_winner_global = most_frequent(colouring)
+    neighbours = graph.neighbors(node)
     colours_neighbours = []
     # print(colouring)
     # print(neighbours)
@@ -121,6 +117,20 @@ def check_plurality_illusion_node(graph, node, colouring):
     return plurality_illusion, weak_plurality_illusion
 
 
+# check_plurality_illusion_node for an integer-coded colouring, with the plurality winners as bitmasks.
+def check_plurality_illusion_node_codes(graph, node, colouring, plurality_winner_global=None):
+    if plurality_winner_global is None:
+        plurality_winner_global = global_plurality_winners(colouring)
+    colours_neighbours = colour_codes.neighbour_colours(graph, node, colouring)
+    # If there are no neighbours, there are no local plurality winners.
+    plurality_winner_neighbours = int(colour_codes.plurality_winner_masks(
+        colour_codes.colour_counts(colours_neighbours, len(COLOURS))))
+    # A strict plurality illusion needs disjoint local and global winners, a weak one only different winners.
+    plurality_illusion = plurality_winner_neighbours & plurality_winner_global == 0
+    weak_plurality_illusion = plurality_winner_neighbours != plurality_winner_global
+    return plurality_illusion, weak_plurality_illusion
+
+
 # Determine which colours appear more than a quota-fraction.
 def determine_quota_winner(agent_colours, quota):
     quota_winner = []
@@ -135,12 +145,25 @@ def determine_quota_winner(agent_colours, quota):
     return quota_winner
 
 
+# Determine the global quota winners of a colouring given by colour names or integer-coded (see colour_codes). For an
+# integer-coded colouring the winners are a bitmask.
+def global_quota_winners(colouring, quota):
+    if isinstance(colouring, np.ndarray):
+        return int(colour_codes.quota_winner_masks(colour_codes.colour_counts(colouring, len(COLOURS)), quota))
+    return determine_quota_winner(colouring, quota)
+
+
 # Check for a given node, graph and colouring whether there is a quota illusion for that node.
-def check_quota_illusion_node(graph, node, colouring, quota):
+# The global quota winners are the same for every node, so they can be given if they have already been determined.
+# The colouring can be given by colour names or integer-coded (see colour_codes).
+def check_quota_illusion_node(graph, node, colouring, quota, quota_winner_global=None):
+    if isinstance(colouring, np.ndarray):
+        return check_quota_illusion_node_codes(graph, node, colouring, quota, quota_winner_global)
     # Determine the global quota winners.
-    quota_winner_global = determine_quota_winner(colouring, quota)
+    if quota_winner_global is None:
+        quota_winner_global = determine_quota_winner(colouring, quota)
     # Determine the neighbours of the node and which colour is the local quota winner.
-    neighbours = list(graph.neighbors(node))
+    neighbours = graph.neighbors(node)
     colours_neighbours = []
     for neighbour in neighbours:
         colours_neighbours.append(colouring[neighbour])
@@ -167,110 +190,216 @@ def check_quota_illusion_node(graph, node, colouring, quota):
     return quota_illusion, weak_quota_illusion
 
 
-# Check for a graph whether there is a (weak)-1/k-(weak)-quota illusion.
+# check_quota_illusion_node for an integer-coded colouring, with the quota winners as bitmasks.
+def check_quota_illusion_node_codes(graph, node, colouring, quota, quota_winner_global=None):
+    if quota_winner_global is None:
+        quota_winner_global = global_quota_winners(colouring, quota)
+    colours_neighbours = colour_codes.neighbour_colours(graph, node, colouring)
+    # If there are no neighbours, there are no local quota winners.
+    quota_winner_neighbours = int(colour_codes.quota_winner_masks(
+        colour_codes.colour_counts(colours_neighbours, len(COLOURS)), quota))
+    # A strict quota illusion needs non-empty, disjoint local and global winners, a weak one only different winners.
+    quota_illusion = (quota_winner_neighbours != 0 and quota_winner_global != 0
+                      and quota_winner_neighbours & quota_winner_global == 0)
+    weak_quota_illusion = quota_winner_neighbours != quota_winner_global
+    return quota_illusion, weak_quota_illusion
+
+
+# Check for a graph whether there is a (weak)-1/k-(weak)-quota illusion. The global quota winners are determined once
+# and all nodes are checked in one sweep (see illusion_profile).
 def quota_illusion_graph(graph, graph_colouring, quota, k):
-    quota_illusion_counter = 0
-    weak_quota_illusion_counter = 0
-    # Loop over the nodes and count the number of nodes under (weak-)quota illusion.
-    for node in graph.nodes():
-        quota_illusion_node, weak_quota_illusion_node = check_quota_illusion_node(graph, node, graph_colouring, quota)
-        if quota_illusion_node:
-            quota_illusion_counter = quota_illusion_counter + 1
-        if weak_quota_illusion_node:
-            weak_quota_illusion_counter = weak_quota_illusion_counter + 1
-    # Determine the fraction of nodes that are under (weak)-quota illusion.
-    quota_illusion_fraction = quota_illusion_counter / len(graph.nodes())
-    weak_quota_illusion_fraction = weak_quota_illusion_counter / len(graph.nodes())
-    k_fraction_quota_illusion = False
-    weak_k_fraction_quota_illusion = False
-    k_fraction_weak_quota_illusion = False
-    weak_k_fraction_weak_quota_illusion = False
-    # Check all instances where there is a (weak)-1/k-weak-quota illusion.
-    if quota_illusion_fraction > 1 / k:
-        k_fraction_quota_illusion = True
-        weak_k_fraction_quota_illusion = True
-    if quota_illusion_fraction == 1 / k:
-        weak_k_fraction_quota_illusion = True
-    if weak_quota_illusion_fraction > 1 / k:
-        k_fraction_weak_quota_illusion = True
-        weak_k_fraction_weak_quota_illusion = True
-    if weak_quota_illusion_fraction == 1 / k:
-        weak_k_fraction_weak_quota_illusion = True
-    return k_fraction_quota_illusion, k_fraction_weak_quota_illusion, weak_k_fraction_quota_illusion, weak_k_fraction_weak_quota_illusion
-
-
-# Check for a graph whether there is a (weak)-1/k-(weak)-plurality illusion.
+    return illusion_profile.illusion_profile(graph, graph_colouring, "quota", k, COLOURS, quota)
+
+
+# Check for a graph whether there is a (weak)-1/k-(weak)-plurality illusion. The global plurality winners are determined
+# once and all nodes are checked in one sweep (see illusion_profile).
 def plurality_illusion_graph(graph, graph_colouring, k):
-    plurality_illusion_counter = 0
-    weak_plurality_illusion_counter = 0
-    # Loop over the nodes and count the number of nodes under (weak-)quota illusion.
-    for node in graph.nodes():
-        plurality_illusion_node, weak_plurality_illusion_node = check_plurality_illusion_node(graph, node,
-                                                                                              graph_colouring)
-        if plurality_illusion_node:
-            plurality_illusion_counter = plurality_illusion_counter + 1
-        if weak_plurality_illusion_node:
-            weak_plurality_illusion_counter = weak_plurality_illusion_counter + 1
-    # Determine the fraction of nodes that are under (weak)-quota illusion.
-    plurality_illusion_fraction = plurality_illusion_counter / len(graph.nodes())
-    weak_plurality_illusion_fraction = weak_plurality_illusion_counter / len(graph.nodes())
-    k_fraction_plurality_illusion = False
-    weak_k_fraction_plurality_illusion = False
-    k_fraction_weak_plurality_illusion = False
-    weak_k_fraction_weak_plurality_illusion = False
-    # Check all instances where there is a (weak)-1/k-weak-plurality illusion.
-    if plurality_illusion_fraction > 1 / k:
-        k_fraction_plurality_illusion = True
-        weak_k_fraction_plurality_illusion = True
-    if plurality_illusion_fraction == 1 / k:
-        weak_k_fraction_plurality_illusion = True
-    if weak_plurality_illusion_fraction > 1 / k:
-        k_fraction_weak_plurality_illusion = True
-        weak_k_fraction_weak_plurality_illusion = True
-    if weak_plurality_illusion_fraction == 1 / k:
-        weak_k_fraction_weak_plurality_illusion = True
-    return k_fraction_plurality_illusion, k_fraction_weak_plurality_illusion, weak_k_fraction_plurality_illusion, weak_k_fraction_weak_plurality_illusion
+    return illusion_profile.illusion_profile(graph, graph_colouring, "plurality", k, COLOURS)
 
 
-# For each possible colouring of the graph, check if there exists a (weak-)1/k-(weak)-quota illusion.
-# Stop if a 1/k-(weak)-quota illusion has been found.
-def quota_illusion_check_per_colouring(graph, graph_colourings, quota, k):
-    k_fraction_weak_quota = False
+# Check whether there is a 1/k-weak-quota illusion for a colouring. Used by the worker processes of parallel_search.
+def has_k_fraction_weak_quota_illusion(graph, graph_colouring, quota, k):
+    return quota_illusion_graph(graph, graph_colouring, quota, k)[1]
+
+
+# Check whether there is a 1/k-weak-plurality illusion for a colouring. Used by the worker processes of parallel_search.
+def has_k_fraction_weak_plurality_illusion(graph, graph_colouring, k):
+    return plurality_illusion_graph(graph, graph_colouring, k)[1]
+
+
+# The number of colourings that will be checked: all four-colourings of the graph if no colourings are given, or the
+# length of a list of colourings. Colourings that are generated lazily, such as one colouring per orbit, have no known
+# length, so None is returned and the progress shows only the rate instead of a wrong percentage and time left.
+def number_of_colourings_to_check(graph, graph_colourings):
+    if graph_colourings is None:
+        return colour_options.number_of_colour_options(graph, COLOURS)
+    if isinstance(graph_colourings, list):
+        return len(graph_colourings)
+    return None
+
+
+# Check the colourings one at a time until check_colouring finds an illusion. The progress is reported through
+# telemetry, which also keeps the time spent on generating and on checking the colourings, the number of colourings that
+# were checked and whether the search stopped early. Returns the position of the first colouring with an illusion
+# together with that colouring, or the number of colourings and None if there is none.
+# If a sweep_checkpoint.SweepCheckpoint is given, the position of the next colouring and the counters are written to it
+# regularly and once more when the sweep ends. With resume, the sweep continues from the position in the checkpoint:
+# when all colourings are generated the sweep jumps straight to it, otherwise the given colourings up to it are skipped.
+# They must then come in the same order as in the run that wrote the checkpoint, which holds for all colourings and for
+# the canonical colourings of symmetry_reduction, so the results are the same as those of an uninterrupted run.
+def first_illusion_colouring(graph, graph_colourings, check_colouring, telemetry, checkpoint=None, resume=False):
+    telemetry.total = number_of_colourings_to_check(graph, graph_colourings)
+    state = checkpoint.load() if checkpoint is not None and resume else None
     time = 0
-    # Check for each colouring if there is a (weak-)1/k-(weak)-quota illusion
-    for colouring in graph_colourings:
-        print(time, "/", len(graph_colourings))
-        (k_fraction_quota_illusion, k_fraction_weak_quota_illusion, weak_k_fraction_quota_illusion,
-         weak_k_fraction_weak_quota_illusion) = quota_illusion_graph(graph, colouring, quota, k)
-        # Stop if a 1/k-weak-q illusion has been found.
-        if k_fraction_weak_quota_illusion:
-            k_fraction_weak_quota = True
-            break
+    if state is not None:
+        time = state["position"]
+        telemetry.resume(time, state["counters"])
+        if state["finished"]:
+            return time, state["witness_colouring"]
+    if graph_colourings is None:
+        colourings = colour_options.iterate_colour_options_between(graph, COLOURS, time, telemetry.total)
+    else:
+        colourings = itertools.islice(graph_colourings, time, None)
+    while True:
+        with telemetry.timer("enumeration"):
+            colouring = next(colourings, None)
+        if colouring is not None:
+            with telemetry.timer("checking"):
+                illusion = check_colouring(colouring)
+            telemetry.count("colourings_checked")
+            if illusion:
+                telemetry.count("early_exits")
+        if colouring is None or illusion:
+            if checkpoint is not None:
+                checkpoint.save({"position": time, "counters": telemetry.counters, "finished": True,
+                                 "witness_colouring": colour_codes.decode_colouring(colouring, COLOURS)})
+            return time, colouring
         time = time + 1
-    if k_fraction_weak_quota:
-        print("A 1/k-weak-quota illusion has been found.")
-        plot_graph(graph, graph_colourings[time])
+        telemetry.progress(time)
+        if checkpoint is not None and checkpoint.due():
+            checkpoint.save({"position": time, "counters": telemetry.counters, "finished": False,
+                             "witness_colouring": None})
+
+
+# The batched version of first_illusion_colouring for 1/k-weak-plurality illusions: all colourings are checked in order
+# of rank in blocks of thousands at once by the batched plurality engine. A checkpoint holds the rank of the first
+# colouring of the next block, so with resume the sweep continues from that block with the same results as an
+# uninterrupted run. Returns the rank of the first colouring with an illusion together with that colouring, or the
+# number of colourings and None if there is none.
+def first_plurality_illusion_block(graph, k, telemetry, checkpoint=None, resume=False):
+    telemetry.total = colour_options.number_of_colour_options(graph, COLOURS)
+    state = checkpoint.load() if checkpoint is not None and resume else None
+    time = 0
+    if state is not None:
+        time = state["position"]
+        telemetry.resume(time, state["counters"])
+        if state["finished"]:
+            return time, state["witness_colouring"]
+    witness_colouring = None
+    with telemetry.timer("checking"):
+        for start, _, weak_counts in batched_illusions.iterate_plurality_illusion_counts(graph, len(COLOURS),
+                                                                                         first_rank=time):
+            k_fraction_weak_illusions, _ = illusion_profile.k_fraction_illusions(weak_counts, len(graph.nodes), k)
+            telemetry.count("colourings_checked", len(weak_counts))
+            # Stop if a 1/k-weak-plurality illusion has been found. As in first_illusion_colouring, the progress is
+            # then the position of the first colouring with an illusion.
+            if k_fraction_weak_illusions.any():
+                telemetry.count("early_exits")
+                time = start + int(np.argmax(k_fraction_weak_illusions))
+                witness_colouring = colour_options.colour_option(time, graph, COLOURS)
+                telemetry.progress(time)
+                break
+            time = start + len(weak_counts)
+            telemetry.progress(time)
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save({"position": time, "counters": telemetry.counters, "finished": False,
+                                 "witness_colouring": None})
+    if checkpoint is not None:
+        checkpoint.save({"position": time, "counters": telemetry.counters, "finished": True,
+                         "witness_colouring": witness_colouring})
+    return time, witness_colouring
+
+
+# The solver and the parallel search do not go through the colourings in one sweep, so they cannot write a checkpoint.
+def check_checkpoint_mode(use_solver, processes, checkpoint, resume):
+    if (checkpoint is not None or resume) and (use_solver or processes is not None):
+        raise ValueError("A checkpoint can only be used by a sweep over the colourings, not by the solver or by "
+                         "several processes.")
+
+
+# For each possible colouring of the graph, check if there exists a (weak-)1/k-(weak)-quota illusion.
+# Stop if a 1/k-(weak)-quota illusion has been found. If no colourings are given, they are generated one at a time.
+# If use_solver is True, the constraint solver decides whether a 1/k-weak-quota illusion exists instead, which works
+# for graphs that are too large to check every colouring. If a number of processes is given, all colourings are split
+# over that many worker processes, which find the same first colouring with a 1/k-weak-quota illusion. The solver and
+# the worker processes go through all colourings themselves, so given colourings are only used by the sweep. The
+# progress and the time per phase are kept in telemetry (see search_telemetry), which can be exported as JSON
+# afterwards. The sweep over the colourings can write a checkpoint and resume from it, see first_illusion_colouring;
+# combining a checkpoint with the solver or with several processes raises a ValueError.
+def quota_illusion_check_per_colouring(graph, graph_colourings, quota, k, use_solver=False, processes=None,
+                                       telemetry=None, checkpoint=None, resume=False):
+    check_checkpoint_mode(use_solver, processes, checkpoint, resume)
+    if telemetry is None:
+        telemetry = search_telemetry.SearchTelemetry()
+    k_fraction_weak_quota = False
+    witness_colouring = None
+    if use_solver:
+        with telemetry.timer("checking"):
+            k_fraction_weak_quota, witness_colouring, _ = illusion_solver.solve_illusion_existence(
+                graph, "quota", k, COLOURS, quota=quota)
+    elif processes is not None:
+        with telemetry.timer("checking"):
+            k_fraction_weak_quota, time, witness_colouring = parallel_search.find_first_illusion(
+                graph, COLOURS, has_k_fraction_weak_quota_illusion, (quota, k), processes)
     else:
-        print("There does not exist a 1/k-weak-quota illusion for any of the possible colourings of the graph.")
-        plot_graph(graph, graph_colourings[0])
+        # Check for each colouring if there is a 1/k-weak-quota illusion and stop at the first one.
+        time, witness_colouring = first_illusion_colouring(
+            graph, graph_colourings, lambda colouring: quota_illusion_graph(graph, colouring, quota, k)[1], telemetry,
+            checkpoint, resume)
+        k_fraction_weak_quota = witness_colouring is not None
+    with telemetry.timer("plotting"):
+        if k_fraction_weak_quota:
+            print("A 1/k-weak-quota illusion has been found.")
+            plot_graph(graph, witness_colouring)
+        else:
+            print("There does not exist a 1/k-weak-quota illusion for any of the possible colourings of the graph.")
+            plot_graph(graph, len(graph.nodes) * [COLOURS[0]])
     return
 
 
 # For each possible colouring of the graph, check if there exists a (weak-)1/k-(weak)-plurality illusion.
-# Stop if a 1/k-(weak)-plurality illusion has been found.
-def plurality_illusion_check_per_colouring(graph, graph_colourings, k):
+# Stop if a 1/k-(weak)-plurality illusion has been found. If no colourings are given, they are generated one at a time.
+# If use_solver is True, the constraint solver decides whether a 1/k-weak-plurality illusion exists instead, which works
+# for graphs that are too large to check every colouring. If a number of processes is given, all colourings are split
+# over that many worker processes, which find the same first colouring with a 1/k-weak-plurality illusion. If batched is
+# True, all colourings are checked in blocks of thousands at once by the batched plurality engine. The solver, the
+# worker processes and the batched engine go through all colourings themselves, so given colourings are only used by
+# the sweep one colouring at a time. The progress and the time per phase are kept in telemetry (see search_telemetry),
+# which can be exported as JSON afterwards. Both sweeps can write a checkpoint and resume from it, see
+# first_illusion_colouring and first_plurality_illusion_block; combining a checkpoint with the solver or with several
+# processes raises a ValueError.
+def plurality_illusion_check_per_colouring(graph, graph_colourings, k, use_solver=False, processes=None,
+                                           batched=False, telemetry=None, checkpoint=None, resume=False):
+    check_checkpoint_mode(use_solver, processes, checkpoint, resume)
+    if telemetry is None:
+        telemetry = search_telemetry.SearchTelemetry()
     k_fraction_weak_plurality = False
-    time = 0
-    # For each colouring check is there is a (weak-)1/k-(weak)-plurality illusion.
-    for colouring in graph_colourings:
-        print(time, "/", len(graph_colourings))
-        (k_fraction_plurality_illusion, k_fraction_weak_plurality_illusion, weak_k_fraction_plurality_illusion,
-         weak_k_fraction_weak_plurality_illusion) = plurality_illusion_graph(graph, colouring, k)
-        # Stop if a 1/k-weak-plurality illusion has been found.
-        if k_fraction_weak_plurality_illusion:
-            k_fraction_weak_plurality = True
-            break
-        time = time + 1
+    if use_solver:
+        with telemetry.timer("checking"):
+            k_fraction_weak_plurality, _, _ = illusion_solver.solve_illusion_existence(graph, "plurality", k, COLOURS)
+    elif processes is not None:
+        with telemetry.timer("checking"):
+            k_fraction_weak_plurality, time, _ = parallel_search.find_first_illusion(
+                graph, COLOURS, has_k_fraction_weak_plurality_illusion, (k,), processes)
+    elif batched:
+        time, witness_colouring = first_plurality_illusion_block(graph, k, telemetry, checkpoint, resume)
+        k_fraction_weak_plurality = witness_colouring is not None
+    else:
+        # For each colouring check is there is a 1/k-weak-plurality illusion and stop at the first one.
+        time, witness_colouring = first_illusion_colouring(
+            graph, graph_colourings, lambda colouring: plurality_illusion_graph(graph, colouring, k)[1], telemetry,
+            checkpoint, resume)
+        k_fraction_weak_plurality = witness_colouring is not None
     if k_fraction_weak_plurality:
         print("A 1/k-weak-plurality illusion has been found.")
         # plot_graph(graph, graph_colourings[time])
@@ -280,19 +409,81 @@ def plurality_illusion_check_per_colouring(graph, graph_colourings, k):
     return k_fraction_weak_plurality
 
 
+# The names of the four variants of a quota illusion, in the order of quota_illusion_graph.
+QUOTA_ILLUSION_VARIANTS = ["1/k-quota", "1/k-weak-quota", "weak-1/k-quota", "weak-1/k-weak-quota"]
+
+
+# Check for every combination of a quota in quotas and a k in ks which quota illusions a graph admits, in one pass over
+# the colourings. The neighbour colour counts are determined once per colouring and shared by all combinations, and
+# the pass stops as soon as every combination has a witness for every variant.
+# Returns an array of shape (4, len(quotas), len(ks)) that holds, for every variant in QUOTA_ILLUSION_VARIANTS, the
+# position of the first colouring with that illusion (or -1 if there is none), together with a dictionary from those
+# positions to the colourings.
+def quota_illusion_sweep(graph, graph_colourings, quotas, ks):
+    if graph_colourings is None:
+        graph_colourings = all_colour_options_graph(graph)
+    first_witnesses = np.full((len(QUOTA_ILLUSION_VARIANTS), len(quotas), len(ks)), -1, dtype=np.int64)
+    witness_colourings = {}
+    for time, colouring in enumerate(graph_colourings):
+        illusions = illusion_profile.quota_illusion_profiles(graph, colouring, quotas, ks, COLOURS)
+        new_witnesses = illusions & (first_witnesses == -1)
+        if new_witnesses.any():
+            first_witnesses[new_witnesses] = time
+            witness_colourings[time] = colouring
+            if (first_witnesses >= 0).all():
+                break
+    return first_witnesses, witness_colourings
+
+
+# Print for every variant a table with one row per quota and one column per k that shows the position of the first
+# colouring with that illusion, or "-" if there is none.
+def print_quota_illusion_sweep(quotas, ks, first_witnesses):
+    for variant, witnesses in zip(QUOTA_ILLUSION_VARIANTS, first_witnesses):
+        print(variant + " illusions:")
+        print("quota \\ k".ljust(12) + "".join(str(k).rjust(10) for k in ks))
+        for quota, row in zip(quotas, witnesses):
+            print(str(round(quota, 4)).ljust(12) + "".join(("-" if time < 0 else str(time)).rjust(10) for time in row))
+
+
+# Check whether the random digraph created from a seed has no colouring with a 1/k-weak-plurality illusion. If a
+# checkpoint directory is given, the sweep over the colourings of the digraph writes a checkpoint file there every
+# checkpoint_interval seconds, and with resume it continues from the checkpoint that an earlier run left behind.
+def no_plurality_illusion_for_seed(seed_number, nodes, k, checkpoint_directory=None, resume=False,
+                                   checkpoint_interval=sweep_checkpoint.CHECKPOINT_INTERVAL):
+    digraph = create_random_directed_graph(nodes, seed_number)
+    checkpoint = None
+    if checkpoint_directory is not None:
+        checkpoint = sweep_checkpoint.SweepCheckpoint(
+            os.path.join(checkpoint_directory, "seed_" + str(seed_number) + ".json"), digraph, seed_number,
+            "1/" + str(k) + "-weak-plurality, canonical colourings", checkpoint_interval)
+    # The colourings are generated while they are checked, so the search starts immediately. Permuting the colours or
+    # applying an automorphism of the graph does not change whether there is an illusion, so only one colouring per
+    # orbit is checked.
+    canonical_colourings = (colouring for colouring, _ in
+                            symmetry_reduction.iterate_canonical_colour_options(digraph, COLOURS))
+    # print("Checking for quota illusions.")
+    # quota_illusion_check_per_colouring(digraph, canonical_colourings, 0.5, k)
+    print("Checking for plurality illusions.")
+    return not plurality_illusion_check_per_colouring(digraph, canonical_colourings, k, checkpoint=checkpoint,
+                                                      resume=resume)
+
+
 if __name__ == "__main__":
-    check_plurality = True
-    seed_number = 0
-    while check_plurality:
-        seed_number = seed_number + 1
-        digraph = create_random_directed_graph(10, seed_number)
-        colour_options = all_colour_options_graph(digraph)
-        # print("Checking for quota illusions.")
-        # quota_illusion_check_per_colouring(digraph, colour_options, 0.5, 4)
-        print("Checking for plurality illusions.")
-        k_fraction_weak_plur = plurality_illusion_check_per_colouring(digraph, colour_options, 4)
-        if not k_fraction_weak_plur:
-            check_plurality = False
-            plot_graph(digraph, colour_options[0])
-            print(digraph.nodes())
-            print(digraph.edges())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the sweeps over the colourings from the checkpoints of an earlier run")
+    parser.add_argument("--checkpoint-directory", default="plurality_checkpoints")
+    parser.add_argument("--checkpoint-interval", type=float, default=sweep_checkpoint.CHECKPOINT_INTERVAL,
+                        help="seconds between two checkpoints of a sweep")
+    arguments = parser.parse_args()
+    os.makedirs(arguments.checkpoint_directory, exist_ok=True)
+    # Random digraphs are checked on all processors until one has been found without a 1/4-weak-plurality illusion. The
+    # checked seeds are recorded in a results file, so a next run continues where this one stopped, and the sweep over
+    # the colourings of every digraph writes checkpoints, so with --resume it continues where it was interrupted.
+    counter_example_seed = counter_example_search.search_seeds(
+        no_plurality_illusion_for_seed, (10, 4, arguments.checkpoint_directory, arguments.resume,
+                                         arguments.checkpoint_interval), "plurality_illusion_seeds.jsonl")
+    digraph = create_random_directed_graph(10, counter_example_seed)
+    plot_graph(digraph, len(digraph.nodes) * [COLOURS[0]])
+    print(digraph.nodes())
+    print(digraph.edges())
@@ -0,0 +1,67 @@
+import collections
+import multiprocessing
+import os
+
+import colour_options
+
+# How many colourings a worker checks between two looks at the first witness found by any worker.
+CHECK_INTERVAL = 64
+
+# The state of a worker process, set once when the worker starts.
+worker_state = {}
+
+
+def initialise_worker(graph, colours, illusion_check, check_arguments, first_witness):
+    worker_state["graph"] = graph
+    worker_state["colours"] = colours
+    worker_state["illusion_check"] = illusion_check
+    worker_state["check_arguments"] = check_arguments
+    worker_state["first_witness"] = first_witness
+
+
+# Check the colourings at positions start up to stop. A worker stops as soon as any worker has found a colouring with
+# an illusion at an earlier position, since then this shard can no longer contain the first one.
+def search_shard(start, stop):
+    graph = worker_state["graph"]
+    illusion_check = worker_state["illusion_check"]
+    check_arguments = worker_state["check_arguments"]
+    first_witness = worker_state["first_witness"]
+    colourings = colour_options.iterate_colour_options_between(graph, worker_state["colours"], start, stop)
+    for rank, colouring in enumerate(colourings, start):
+        if (rank - start) % CHECK_INTERVAL == 0 and rank > first_witness.value:
+            return None
+        if illusion_check(graph, colouring, *check_arguments):
+            with first_witness.get_lock():
+                if rank < first_witness.value:
+                    first_witness.value = rank
+            return rank
+    return None
+
+
+# Search all colourings of a graph for the first one (in the order of colour_options.iterate_colour_options) for which
+# illusion_check(graph, colouring, *check_arguments) is True. The colourings are split into shards of consecutive
+# positions that are checked by a pool of worker processes. All workers share the position of the first witness found
+# so far, so every worker stops the moment a witness is found before its current position, and no new shards are
+# started after it. Returns whether there is such a colouring, its position and the colouring itself.
+def find_first_illusion(graph, colours, illusion_check, check_arguments, processes=None, shard_size=4096):
+    if processes is None:
+        processes = os.cpu_count()
+    number_of_colourings = colour_options.number_of_colour_options(graph, colours)
+    first_witness = multiprocessing.Value("q", number_of_colourings)
+    with multiprocessing.Pool(processes, initializer=initialise_worker,
+                              initargs=(graph, colours, illusion_check, check_arguments, first_witness)) as pool:
+        pending = collections.deque()
+        next_start = 0
+        while True:
+            # Keep every worker busy, but do not start shards after the first witness found so far.
+            while len(pending) < 2 * processes and next_start < min(number_of_colourings, first_witness.value):
+                next_stop = min(next_start + shard_size, number_of_colourings)
+                pending.append(pool.apply_async(search_shard, (next_start, next_stop)))
+                next_start = next_stop
+            if not pending:
+                break
+            pending.popleft().get()
+    witness_index = first_witness.value
+    if witness_index == number_of_colourings:
+        return False, None, None
+    return True, witness_index, colour_options.colour_option(witness_index, graph, colours)
@@ -0,0 +1,47 @@
+import networkx as nx
+import numpy as np
+
+
+# Draw a batch of random k-out digraphs without self-loops or multiple edges. Every node draws k neighbours uniformly
+# at random from the other nodes and a neighbour that is drawn more than once becomes a single edge, so every node has
+# between 1 and k neighbours. This costs O(num_graphs * nodes * k) time and memory.
+# Returns an array of shape (num_graphs, nodes, k) with the neighbours of every node, in which the places of repeated
+# neighbours hold -1.
+def random_k_out_neighbours(num_graphs, nodes, k, seed=None):
+    random_generator = np.random.default_rng(seed)
+    neighbours = random_generator.integers(0, nodes - 1, size=(num_graphs, nodes, k), dtype=np.int32)
+    # Skip the node itself: drawn values at or above the position of the node move up by one.
+    neighbours = neighbours + (neighbours >= np.arange(nodes, dtype=np.int32)[:, None])
+    neighbours.sort(axis=2)
+    repeated = np.zeros(neighbours.shape, dtype=bool)
+    repeated[:, :, 1:] = neighbours[:, :, 1:] == neighbours[:, :, :-1]
+    neighbours[repeated] = -1
+    return neighbours
+
+
+# Turn a batch of neighbour arrays from random_k_out_neighbours into compact edge arrays. Returns an array with the
+# start of the edges of every graph (with the total number of edges at the end) and an array of shape (num_edges, 2)
+# with the edges of all graphs after each other.
+def edge_arrays(neighbours):
+    num_graphs, nodes, k = neighbours.shape
+    present = neighbours >= 0
+    sources = np.broadcast_to(np.arange(nodes, dtype=np.int32)[:, None], (nodes, k))
+    edges = np.stack([np.broadcast_to(sources, neighbours.shape)[present], neighbours[present]], axis=1)
+    offsets = np.zeros(num_graphs + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(present.reshape(num_graphs, -1).sum(axis=1))
+    return offsets, edges
+
+
+# Create a networkx digraph from the neighbour array of one graph. The nodes are labelled from label_offset onwards.
+def to_digraph(graph_neighbours, label_offset=0):
+    graph = nx.DiGraph()
+    graph.add_nodes_from(range(label_offset, len(graph_neighbours) + label_offset))
+    for node, node_neighbours in enumerate(graph_neighbours):
+        graph.add_edges_from((node + label_offset, neighbour + label_offset)
+                             for neighbour in node_neighbours if neighbour >= 0)
+    return graph
+
+
+# Create one random k-out digraph without self-loops or multiple edges in which every node has a neighbour.
+def create_random_k_out_digraph(nodes, k, seed=None, label_offset=0):
+    return to_digraph(random_k_out_neighbours(1, nodes, k, seed)[0], label_offset)
@@ -0,0 +1,80 @@
+import json
+import time
+from contextlib import contextmanager
+
+# How often (in seconds) the progress of a search is reported.
+PROGRESS_INTERVAL = 5
+
+
+# Keeps track of a long search: reports the progress at most once every report_interval seconds instead of after every
+# colouring, adds up how much time is spent per phase of the search (such as enumerating the colourings, checking them
+# and plotting) and counts events such as the number of colourings checked (colourings_checked) and the number of
+# searches that stopped at an illusion (early_exits). Everything can be written to a JSON file at the end of a run, so
+# different configurations of a search can be compared.
+class SearchTelemetry:
+    def __init__(self, total=None, report_interval=PROGRESS_INTERVAL, name="colourings"):
+        self.total = total
+        self.report_interval = report_interval
+        self.name = name
+        self.start_time = time.perf_counter()
+        self.last_report = self.start_time
+        self.done = 0
+        self.start_done = 0
+        self.phase_seconds = {}
+        self.counters = {}
+
+    # Add the time spent inside the with-block to the given phase.
+    @contextmanager
+    def timer(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[phase] = self.phase_seconds.get(phase, 0) + time.perf_counter() - start
+
+    def count(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    # Continue a run that was resumed after done items had been handled. Only the items handled since then count for
+    # the rate.
+    def resume(self, done, counters):
+        self.done = done
+        self.start_done = done
+        self.counters = dict(counters)
+
+    # Record that done items have been handled so far. A progress line is only printed if the last one was printed at
+    # least report_interval seconds ago, so this can be called after every colouring.
+    def progress(self, done):
+        self.done = done
+        now = time.perf_counter()
+        if now - self.last_report >= self.report_interval:
+            self.last_report = now
+            print(self.progress_line(now))
+
+    # The number of items handled, the rate and, if the total is known, the percentage done and the estimated time
+    # left.
+    def progress_line(self, now=None):
+        if now is None:
+            now = time.perf_counter()
+        rate = (self.done - self.start_done) / max(now - self.start_time, 1e-9)
+        if self.total is None:
+            return str(self.done) + " " + self.name + ", " + str(round(rate, 1)) + " " + self.name + "/s"
+        percentage = round(100 * self.done / max(self.total, 1), 1)
+        line = (str(self.done) + " / " + str(self.total) + " " + self.name + " (" + str(percentage) + "%), "
+                + str(round(rate, 1)) + " " + self.name + "/s")
+        if rate > 0:
+            line = line + ", ETA " + str(round((self.total - self.done) / rate)) + " s"
+        return line
+
+    # A summary of the run that can be written as JSON.
+    def summary(self):
+        seconds = time.perf_counter() - self.start_time
+        return {"name": self.name, "done": self.done, "total": self.total, "resumed_from": self.start_done,
+                "seconds": round(seconds, 6), "rate": round((self.done - self.start_done) / max(seconds, 1e-9), 3),
+                "phase_seconds": {phase: round(phase_seconds, 6)
+                                  for phase, phase_seconds in self.phase_seconds.items()},
+                "counters": dict(self.counters)}
+
+    def export_json(self, path):
+        with open(path, "w") as telemetry_file:
+            json.dump(self.summary(), telemetry_file, indent=2)
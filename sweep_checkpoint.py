@@ -0,0 +1,49 @@
+import json
+import os
+import time
+
+# How often (in seconds) the state of a sweep over the colourings is written to its checkpoint file.
+CHECKPOINT_INTERVAL = 60
+
+
+# The checkpoint of a sweep over the colourings of one graph. The file holds the seed and the edge list of the graph
+# and a description of the search, so a checkpoint is never used to continue a sweep over another graph, together with
+# the state of the sweep: the position of the next colouring to check and the partial counts. The state is written at
+# most once every interval seconds, so writing it costs next to nothing compared to checking the colourings.
+class SweepCheckpoint:
+    def __init__(self, path, graph, seed=None, search=None, interval=CHECKPOINT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        # Go through JSON once, so the identity compares equal to the one read back from a file.
+        nodes = sorted(int(node) for node in graph.nodes())
+        edges = sorted([int(node), int(neighbour)] for node, neighbour in graph.edges())
+        self.identity = json.loads(json.dumps({"seed": seed, "search": search, "nodes": nodes, "edges": edges}))
+        self.last_save = time.perf_counter()
+
+    # Read the state of the sweep from the checkpoint file. Returns None if there is no checkpoint yet.
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        for key, value in self.identity.items():
+            if checkpoint.get(key) != value:
+                raise ValueError("The checkpoint " + self.path + " belongs to a sweep with another " + key + ".")
+        return checkpoint["state"]
+
+    # Whether the last checkpoint was written at least interval seconds ago.
+    def due(self):
+        return time.perf_counter() - self.last_save >= self.interval
+
+    # Write the state of the sweep. The state is first written to a temporary file which then replaces the checkpoint,
+    # so a run that is killed while writing leaves the previous checkpoint intact.
+    def save(self, state):
+        checkpoint = dict(self.identity)
+        checkpoint["state"] = state
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_path, self.path)
+        self.last_save = time.perf_counter()
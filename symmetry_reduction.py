@@ -0,0 +1,122 @@
+import itertools
+
+import networkx as nx
+import numpy as np
+
+import batched_illusions
+import csr_graph
+
+
+# Determine all automorphisms of a graph. Each automorphism is a list that gives for the node at position p (its label
+# minus label_offset) the position of the node it is mapped to. Multiple edges between two nodes count as one edge.
+def graph_automorphisms(graph, label_offset=0):
+    graph = csr_graph.as_networkx(graph)
+    if graph.is_directed():
+        simple_graph = nx.DiGraph(graph)
+        matcher = nx.algorithms.isomorphism.DiGraphMatcher(simple_graph, simple_graph)
+    else:
+        simple_graph = nx.Graph(graph)
+        matcher = nx.algorithms.isomorphism.GraphMatcher(simple_graph, simple_graph)
+    automorphisms = []
+    for mapping in matcher.isomorphisms_iter():
+        automorphism = [0] * len(graph.nodes)
+        for node, image in mapping.items():
+            automorphism[node - label_offset] = image - label_offset
+        automorphisms.append(automorphism)
+    return automorphisms
+
+
+# Iterate over all colourings in which the colours appear in order of their first occurrence (restricted growth
+# strings). Every colouring is a permutation of the colours away from exactly one of these colourings.
+def restricted_growth_strings(num_nodes, num_colours):
+    codes = [0] * num_nodes
+
+    def extend(position, colours_used):
+        if position == num_nodes:
+            yield tuple(codes)
+            return
+        for code in range(min(colours_used + 1, num_colours)):
+            codes[position] = code
+            yield from extend(position + 1, max(colours_used, code + 1))
+
+    yield from extend(0, 0)
+
+
+# Rename the colours of an integer-coded colouring in order of their first occurrence.
+def canonical_colour_names(codes):
+    renaming = {}
+    for code in codes:
+        if code not in renaming:
+            renaming[code] = len(renaming)
+    return tuple(renaming[code] for code in codes)
+
+
+# Determine the colourings (up to permuting the colours) that an integer-coded colouring is mapped to by the
+# automorphisms of the graph.
+def automorphic_images(codes, automorphisms):
+    images = set()
+    for automorphism in automorphisms:
+        image = [0] * len(codes)
+        for position, code in enumerate(codes):
+            image[automorphism[position]] = code
+        images.add(canonical_colour_names(image))
+    return images
+
+
+# The number of colourings in an orbit with the given automorphic images. Each image using c different colours stands
+# for num_colours * (num_colours - 1) * ... * (num_colours - c + 1) colourings.
+def orbit_size(images, num_colours):
+    size = 0
+    for image in images:
+        colour_renamings = 1
+        for used_colour in range(len(set(image))):
+            colour_renamings = colour_renamings * (num_colours - used_colour)
+        size = size + colour_renamings
+    return size
+
+
+# Iterate over the ranks (as used by colour_options.colour_option) of all colourings in an orbit.
+def orbit_ranks(images, num_colours):
+    for image in images:
+        used_colours = len(set(image))
+        for renaming in itertools.permutations(range(num_colours), used_colours):
+            rank = 0
+            for code in image:
+                rank = rank * num_colours + renaming[code]
+            yield rank
+
+
+# Iterate over the orbits of the colourings of a graph under the graph automorphisms combined with all permutations of
+# the colours. Yields the canonical integer-coded colouring of each orbit, which is the smallest one in the order of
+# restricted_growth_strings, together with the automorphic images that make up the orbit.
+def iterate_colour_orbits(graph, num_colours, label_offset=0):
+    automorphisms = graph_automorphisms(graph, label_offset)
+    for codes in restricted_growth_strings(len(graph.nodes), num_colours):
+        images = automorphic_images(codes, automorphisms)
+        if codes == min(images):
+            yield codes, images
+
+
+# Iterate over one colouring per orbit of the colourings of a graph, together with the size of the orbit. The orbit
+# sizes add up to the total number of colourings, so counts can be recovered exactly from the orbit sizes.
+def iterate_canonical_colour_options(graph, colours, label_offset=0):
+    for codes, images in iterate_colour_orbits(graph, len(colours), label_offset):
+        yield [colours[code] for code in codes], orbit_size(images, len(colours))
+
+
+# Iterate over the two-colourings of a graph that lead to a (weak-)majority-(weak)-majority illusion, checking only one
+# colouring per orbit. Illusions are the same for every colouring in an orbit, so the ranks of all colourings in the
+# orbits with an illusion are yielded, together with the number of nodes under majority illusion.
+def iterate_majority_majority_illusions(graph, weak_node, weak_global, label_offset=0, block_size=2 ** 12):
+    num_nodes = len(graph.nodes)
+    adjacency = batched_illusions.adjacency_matrix(graph, label_offset)
+    orbits = iterate_colour_orbits(graph, 2, label_offset)
+    block = list(itertools.islice(orbits, block_size))
+    while block:
+        colourings = np.array([codes for codes, _ in block], dtype=np.uint8).reshape(len(block), num_nodes)
+        illusion_counts = batched_illusions.majority_illusion_nodes(adjacency, colourings, weak_node).sum(axis=1)
+        illusions = batched_illusions.majority_majority_illusions(illusion_counts, num_nodes, weak_global)
+        for index in np.flatnonzero(illusions):
+            for rank in orbit_ranks(block[index][1], 2):
+                yield rank, int(illusion_counts[index])
+        block = list(itertools.islice(orbits, block_size))
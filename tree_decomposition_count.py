@@ -0,0 +1,222 @@
+import networkx as nx
+from networkx.algorithms.approximation import treewidth_min_fill_in
+
+import csr_graph
+from batched_illusions import BLUE, RED, TIE
+from gray_code_search import local_majority_winner
+
+
+# Count the two-colourings of a graph by the number of nodes under majority illusion with a dynamic programme over a
+# tree decomposition of the underlying undirected graph. This is exact and takes time exponential only in the width of
+# the decomposition, so sparse graphs such as cycles, trees and paths with hundreds of nodes can be handled.
+#
+# The bags of the decomposition are processed from the leaves up. The table of a bag maps a state, which gives for
+# every node in the bag its colour and how many of its neighbours that have been counted so far are red, to a
+# polynomial in y and z. The coefficient of y^r z^c is the number of colourings of the nodes seen so far with r red
+# nodes and c nodes under illusion among the nodes that have been forgotten. An edge is counted when the first of its
+# end points is forgotten; at that moment the other end point is always in the bag. A node is forgotten when the
+# programme leaves the highest bag that contains it, and then its number of red neighbours is complete, so whether it
+# is under illusion is known once the global winner is fixed. The global winner only depends on the final number of
+# red nodes, so the programme is run once for every global winner and only the matching powers of y are kept.
+#
+# The polynomials are stored as Python integers (Kronecker substitution): the coefficient of y^r z^c is the slot
+# r * (n + 1) + c of slot_bits bits each. Multiplying by y or z is a shift and multiplying polynomials is multiplying
+# integers, which Python does exactly.
+
+
+# Everything the dynamic programme needs to know about a graph. Nodes are identified by their position (label minus
+# label_offset). Multiple edges between two nodes count as one neighbour, as in check_majority_illusion_node.
+class IllusionCountProblem:
+    def __init__(self, graph, weak_node, global_winner, label_offset=0):
+        self.num_nodes = len(graph.nodes)
+        self.weak_node = weak_node
+        self.global_winner = global_winner
+        self.out_neighbours = [set() for _ in range(self.num_nodes)]
+        self.in_neighbours = [set() for _ in range(self.num_nodes)]
+        for node in graph.nodes():
+            for neighbour in graph.neighbors(node):
+                self.out_neighbours[node - label_offset].add(neighbour - label_offset)
+                self.in_neighbours[neighbour - label_offset].add(node - label_offset)
+        self.degrees = [len(neighbours) for neighbours in self.out_neighbours]
+        # Red neighbour counts above half the degree all give a red local winner, so they are capped.
+        self.caps = [degree // 2 + 1 for degree in self.degrees]
+        # Every coefficient is at most 2^n, so a slot of n + 1 bits never overflows. Slots are whole bytes, which makes
+        # reading the coefficients back fast.
+        self.slot_bits = 8 * ((self.num_nodes + 2 + 7) // 8)
+        self.red_shift = self.slot_bits * (self.num_nodes + 1)
+
+    # Whether a node with the given (capped) number of red neighbours is under illusion.
+    def under_illusion(self, node, red_neighbours):
+        local_winner = local_majority_winner(red_neighbours, self.degrees[node])
+        if local_winner == self.global_winner:
+            return False
+        return self.weak_node or (local_winner != TIE and self.global_winner != TIE)
+
+    # The table of a bag before any of its children are joined in: all colourings of its nodes, with no neighbours
+    # counted yet.
+    def introduce(self, bag):
+        table = {}
+        for colours_code in range(2 ** len(bag)):
+            colours = tuple((colours_code >> index) & 1 for index in range(len(bag)))
+            table[colours, (0,) * len(bag)] = 1 << (self.red_shift * sum(colours))
+        return table
+
+    # Extend the table of a child, whose nodes are all in the bag, to the table of the bag by introducing the nodes of
+    # the bag that are not in the child. This is the same as joining the child into the table from introduce, but it
+    # needs no multiplications.
+    def extend(self, child_table, child_bag, bag):
+        indices = [bag.index(node) for node in child_bag]
+        new_positions = [index for index, node in enumerate(bag) if node not in child_bag]
+        table = {}
+        for (child_colours, child_counts), polynomial in child_table.items():
+            for colours_code in range(2 ** len(new_positions)):
+                colours = [0] * len(bag)
+                counts = [0] * len(bag)
+                for index, colour, count in zip(indices, child_colours, child_counts):
+                    colours[index] = colour
+                    counts[index] = count
+                num_red = 0
+                for bit, index in enumerate(new_positions):
+                    colours[index] = (colours_code >> bit) & 1
+                    num_red = num_red + colours[index]
+                table[tuple(colours), tuple(counts)] = polynomial << (self.red_shift * num_red)
+        return table
+
+    # Forget the node at index position of the bag: count its edges to the other nodes in the bag (and to itself),
+    # then add whether it is under illusion to the polynomial and drop it from the states.
+    def forget(self, table, bag, position):
+        node = bag[position]
+        new_table = {}
+        for (colours, counts), polynomial in table.items():
+            counts = list(counts)
+            for index, other in enumerate(bag):
+                if other in self.out_neighbours[node]:
+                    counts[position] = min(counts[position] + colours[index], self.caps[node])
+                if other != node and other in self.in_neighbours[node]:
+                    counts[index] = min(counts[index] + colours[position], self.caps[other])
+            if self.under_illusion(node, counts[position]):
+                polynomial = polynomial << self.slot_bits
+            state = (colours[:position] + colours[position + 1:], tuple(counts[:position] + counts[position + 1:]))
+            new_table[state] = new_table.get(state, 0) + polynomial
+        return new_table, bag[:position] + bag[position + 1:]
+
+    # Join the table of a child, whose nodes are all in the bag, into the table of the bag. The colours of the shared
+    # nodes must agree, their red neighbour counts add up and their red colours were counted twice.
+    def join(self, table, bag, child_table, child_bag):
+        indices = [bag.index(node) for node in child_bag]
+        child_states = {}
+        for (colours, counts), polynomial in child_table.items():
+            child_states.setdefault(colours, []).append((counts, polynomial))
+        new_table = {}
+        for (colours, counts), polynomial in table.items():
+            shared_colours = tuple(colours[index] for index in indices)
+            double_red = self.red_shift * sum(shared_colours)
+            # Child states that lead to the same new state are added up first, so every new state costs only one
+            # multiplication of polynomials.
+            child_sums = {}
+            for child_counts, child_polynomial in child_states.get(shared_colours, []):
+                new_counts = list(counts)
+                for index, child_count in zip(indices, child_counts):
+                    new_counts[index] = min(new_counts[index] + child_count, self.caps[bag[index]])
+                new_counts = tuple(new_counts)
+                child_sums[new_counts] = child_sums.get(new_counts, 0) + child_polynomial
+            for new_counts, child_polynomial in child_sums.items():
+                state = (colours, new_counts)
+                new_table[state] = new_table.get(state, 0) + ((polynomial * child_polynomial) >> double_red)
+        return new_table
+
+    # Run the dynamic programme over a tree decomposition. Returns the polynomial of the whole graph.
+    def solve(self, decomposition):
+        result = 1
+        for component in nx.connected_components(decomposition):
+            # Rooting the tree at a leaf means a path-like decomposition needs no joins at all.
+            root = min(component, key=decomposition.degree)
+            # Process the bags in an order where every bag comes after its children.
+            parents = {root: None}
+            order = [root]
+            for bag in order:
+                for neighbour in decomposition.neighbors(bag):
+                    if neighbour not in parents:
+                        parents[neighbour] = bag
+                        order.append(neighbour)
+            tables = {}
+            for tree_bag in reversed(order):
+                bag = sorted(tree_bag)
+                table = None
+                children = [child for child in decomposition.neighbors(tree_bag) if parents.get(child) == tree_bag]
+                for child in children:
+                    child_table, child_bag = tables.pop(child)
+                    # Forget the nodes of the child that are not in this bag.
+                    for node in [node for node in child_bag if node not in tree_bag]:
+                        child_table, child_bag = self.forget(child_table, child_bag, child_bag.index(node))
+                    if table is None:
+                        table = self.extend(child_table, child_bag, bag)
+                    else:
+                        table = self.join(table, bag, child_table, child_bag)
+                if table is None:
+                    table = self.introduce(bag)
+                tables[tree_bag] = (table, bag)
+            table, bag = tables.pop(root)
+            while bag:
+                table, bag = self.forget(table, bag, 0)
+            result = result * table[(), ()]
+        return result
+
+    # Read the number of colourings with c nodes under illusion for every c from the polynomial, keeping only the
+    # numbers of red nodes for which the global winner is the one this programme was run for.
+    def distribution(self, polynomial):
+        slot_bytes = self.slot_bits // 8
+        num_slots = (self.num_nodes + 1) ** 2
+        data = polynomial.to_bytes(num_slots * slot_bytes, "little")
+        distribution = [0] * (self.num_nodes + 1)
+        for num_red in range(self.num_nodes + 1):
+            if local_majority_winner(num_red, self.num_nodes) != self.global_winner:
+                continue
+            for illusion_count in range(self.num_nodes + 1):
+                start = (num_red * (self.num_nodes + 1) + illusion_count) * slot_bytes
+                distribution[illusion_count] += int.from_bytes(data[start:start + slot_bytes], "little")
+        return distribution
+
+
+# A tree decomposition of the underlying undirected graph, with the nodes given by their positions.
+def tree_decomposition(graph, label_offset=0):
+    undirected_graph = nx.Graph()
+    undirected_graph.add_nodes_from(node - label_offset for node in graph.nodes())
+    for node in graph.nodes():
+        for neighbour in graph.neighbors(node):
+            if neighbour != node:
+                undirected_graph.add_edge(node - label_offset, neighbour - label_offset)
+    return treewidth_min_fill_in(undirected_graph)
+
+
+# The number of two-colourings of a graph with c nodes under majority illusion, for every c from 0 to n, split by the
+# global winner. Boolean weak_node is used in the same way as in check_majority_illusion_node.
+# Returns a dictionary from the global winner (BLUE, RED or TIE) to a list with the number of colourings per c.
+def illusion_count_distribution_per_winner(graph, weak_node, label_offset=0):
+    _, decomposition = tree_decomposition(csr_graph.as_networkx(graph), label_offset)
+    distributions = {}
+    for global_winner in (BLUE, RED, TIE):
+        problem = IllusionCountProblem(graph, weak_node, global_winner, label_offset)
+        # With an odd number of nodes there is never a global tie.
+        if global_winner == TIE and len(graph.nodes) % 2 == 1:
+            distributions[global_winner] = [0] * (len(graph.nodes) + 1)
+        else:
+            distributions[global_winner] = problem.distribution(problem.solve(decomposition))
+    return distributions
+
+
+# The number of two-colourings of a graph with c nodes under majority illusion, for every c from 0 to n.
+def illusion_count_distribution(graph, weak_node, label_offset=0):
+    distributions = illusion_count_distribution_per_winner(graph, weak_node, label_offset)
+    return [sum(counts) for counts in zip(*distributions.values())]
+
+
+# The number of colourings with more than a 1/k-fraction of the nodes under illusion, or at least a 1/k-fraction if
+# weak_graph is True. With k = 2 this is the number of colourings with a (weak-)majority-(weak)-majority illusion.
+def count_k_fraction_illusions(distribution, k, weak_graph=False):
+    num_nodes = len(distribution) - 1
+    count = 0
+    for illusion_count, colourings in enumerate(distribution):
+        if illusion_count / num_nodes > 1 / k or (weak_graph and illusion_count / num_nodes == 1 / k):
+            count = count + colourings
+    return count